@@ -0,0 +1,78 @@
+"""The parse-and-diff pipeline shared by the synchronous page and background jobs."""
+from export_parser import UsernameStream, collect_usernames
+from export_sources import READ_ERRORS, ExportSource, read_followers, read_member_usernames
+from metrics import registry
+from username_index import UsernameIndex, partition_sorted, timestamp_column
+
+
+class AnalysisError(Exception):
+    """An upload could not be analysed; the message is safe to show to users."""
+
+
+def read_usernames(stream, name, progress=None):
+    """Stream one uploaded export into a {username: timestamp} map."""
+    try:
+        parser = UsernameStream(stream, progress=progress)
+        usernames = collect_usernames(parser)
+    except (OSError, ValueError) as e:
+        print(f"Error loading JSON: {e}")
+        raise AnalysisError("Error reading one or both JSON files.") from e
+    return usernames
+
+
+def read_export_archive(stream, name, progress=None):
+    """Parse an uploaded export ZIP into (followers, following) username maps."""
+    try:
+        with ExportSource(stream) as source:
+            if not source.followers or not source.following:
+                print(f"No followers/following files in {name}")
+                raise AnalysisError("Could not find followers_N.json and following.json in the ZIP.")
+            followers = read_followers(source, progress)
+            following = read_member_usernames(source, source.following, progress)
+    except READ_ERRORS as e:
+        print(f"Error loading export ZIP: {e}")
+        raise AnalysisError("Error reading the export ZIP.") from e
+    return followers, following
+
+
+def diff_usernames(followers_usernames, following_usernames):
+    """Split the two username maps into the three sorted result categories, with their follow timestamps."""
+    if not followers_usernames or not following_usernames:
+        raise AnalysisError("Error reading one or both JSON files.")
+
+    registry.inc("fan_usernames_total", len(followers_usernames), side="followers")
+    registry.inc("fan_usernames_total", len(following_usernames), side="following")
+
+    # Sort each side once; a single merge then yields all three categories already in order
+    with registry.stage("sort"):
+        followers_names = sorted(followers_usernames)
+        following_names = sorted(following_usernames)
+    with registry.stage("diff"):
+        not_following_back, not_followed_back, mutuals = partition_sorted(following_names, followers_names)
+
+    return {
+        'not_following_back': UsernameIndex(not_following_back, {
+            'following': timestamp_column(following_usernames, not_following_back),
+        }),
+        'not_followed_back': UsernameIndex(not_followed_back, {
+            'followers': timestamp_column(followers_usernames, not_followed_back),
+        }),
+        'mutuals': UsernameIndex(mutuals, {
+            'followers': timestamp_column(followers_usernames, mutuals),
+            'following': timestamp_column(following_usernames, mutuals),
+        }),
+    }
+
+
+def read_uploads(export_zip=None, followers=None, following=None, progress=None):
+    """Read either an export ZIP or a (followers, following) pair into two username maps.
+
+    Each argument is a ``(stream, name)`` tuple. Username extraction happens
+    while the stream is decoded, so the "parse" stage covers both.
+    """
+    progress = registry.progress(progress)
+    with registry.stage("parse"):
+        if export_zip is not None:
+            return read_export_archive(*export_zip, progress=progress)
+        return read_usernames(*followers, progress=progress), read_usernames(*following, progress=progress)
+
@@ -1,81 +1,528 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
-import os
+from flask import Flask, Request, Response, current_app, g, jsonify, render_template, request, redirect, url_for, flash
+import atexit
+import cProfile
+import csv
+import hashlib
+import io
 import json
-from werkzeug.utils import secure_filename
+import os
+import re
+import secrets
+import tempfile
+import time
+
+from analysis import AnalysisError, diff_usernames, read_uploads
+from export_parser import normalize_username
+from jobs import JobQueue, QueueFull
+from metrics import registry
+from result_cache import ResultCache
+from result_store import ResultStore
+from snapshots import SnapshotStore
+from timeline import GRANULARITIES, timeline
+from username_index import SEARCH_MODES
+
+
+class HashingUploadBuffer:
+    """Upload buffer that hashes the content as it is written."""
+
+    def __init__(self, file):
+        self._file = file
+        self._sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self._sha256.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class SpooledUploadRequest(Request):
+    """Buffer each uploaded file privately to this request.
+
+    Requests up to ``UPLOAD_SPOOL_MAX_SIZE`` are kept in memory; larger ones go
+    to a named temporary file owned by this request (so the process pool can
+    reopen big exports by path) that is removed when the request closes.
+    Nothing is shared between requests or workers.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        max_size = current_app.config['UPLOAD_SPOOL_MAX_SIZE']
+        if total_content_length is not None and total_content_length <= max_size:
+            return HashingUploadBuffer(io.BytesIO())
+        return HashingUploadBuffer(tempfile.NamedTemporaryFile('w+b', suffix='.upload'))
+
 
 app = Flask(__name__)
 app.secret_key = "supersecretkey"
+app.request_class = SpooledUploadRequest
+app.config['UPLOAD_SPOOL_MAX_SIZE'] = 8 * 1024 * 1024
+app.config['RESULT_CACHE_SIZE'] = 128
+# Per-worker memory budget for cached results (a 1M-username result is roughly 30 MB)
+app.config['RESULT_CACHE_MAX_BYTES'] = 256 * 1024 * 1024
+app.config['RESULT_CACHE_TTL'] = 60 * 60
+app.config['RESULT_DB'] = os.path.join(app.instance_path, 'results.sqlite3')
+app.config['RESULTS_PAGE_SIZE'] = 100
+app.config['RESULTS_MAX_PAGE_SIZE'] = 500
+app.config['JOB_DB'] = os.path.join(app.instance_path, 'jobs.sqlite3')
+app.config['JOB_WORKERS'] = 2
+app.config['JOB_MAX_PENDING'] = 16
+app.config['JOB_TTL'] = 60 * 60
+app.config['SNAPSHOT_DB'] = os.path.join(app.instance_path, 'snapshots.sqlite3')
+app.config['CHANGES_PREVIEW_SIZE'] = 50
+app.config['EXPORT_BATCH_SIZE'] = 1000
+app.config['METRICS_DIR'] = os.path.join(app.instance_path, 'metrics')
+app.config['METRICS_FLUSH_INTERVAL'] = 5
+# Requests slower than this many seconds get a cProfile dump in PROFILE_DIR; None disables profiling
+app.config['PROFILE_SLOW_REQUESTS'] = None
+app.config['PROFILE_DIR'] = os.path.join(app.instance_path, 'profiles')
+
+RESULT_CATEGORIES = ('not_following_back', 'not_followed_back', 'mutuals')
+# Uploads publish this worker's metrics straight away; other requests at most every METRICS_FLUSH_INTERVAL
+ANALYSIS_ENDPOINTS = ('index', 'create_job')
+ACCOUNT_NAME = re.compile(r'[a-z0-9._]{1,30}')
+# Snapshot histories belong to whoever holds this random cookie, not to anyone who knows the account name
+OWNER_COOKIE = 'fan_owner'
+OWNER_TOKEN = re.compile(r'[A-Za-z0-9_-]{43}')
+OWNER_COOKIE_MAX_AGE = 400 * 24 * 60 * 60
+EXPORT_FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+# followed_you_at / you_followed_at are the string_list_data timestamps from the followers / following side
+EXPORT_COLUMNS = ('category', 'username', 'profile_url', 'followed_you_at', 'you_followed_at')
+
+def result_size(result):
+    return sum(index.nbytes for index in result.values())
+
+result_cache = ResultCache(app.config['RESULT_CACHE_SIZE'], app.config['RESULT_CACHE_TTL'],
+                           max_bytes=app.config['RESULT_CACHE_MAX_BYTES'], sizeof=result_size)
+result_store = ResultStore(app.config['RESULT_DB'], app.config['RESULT_CACHE_TTL'])
+job_queue = JobQueue(app.config['JOB_DB'], app.config['JOB_WORKERS'], app.config['JOB_MAX_PENDING'],
+                     app.config['JOB_TTL'], user_errors=(AnalysisError,))
+snapshot_store = SnapshotStore(app.config['SNAPSHOT_DB'])
+registry.directory = app.config['METRICS_DIR']
+registry.flush_interval = app.config['METRICS_FLUSH_INTERVAL']
+atexit.register(registry.flush, force=True)
+
+def result_cache_counters():
+    stats = result_cache.stats()
+    return [(f'fan_result_cache_{key}_total', stats[key], {}) for key in ('hits', 'misses', 'evictions')]
+
+registry.register(result_cache_counters)
+
+def make_result_id(cache_key):
+    return hashlib.sha256('|'.join(cache_key).encode()).hexdigest()[:32]
+
+def load_result(result_id):
+    """Look a result up in this worker's cache, then in the shared store."""
+    result = result_cache.get(result_id)
+    outcome = 'cache'
+    if result is None:
+        result = result_store.load(result_id)
+        outcome = 'store' if result is not None else 'miss'
+        if result is not None:
+            result_cache.put(result_id, result)
+    registry.inc('fan_result_cache_requests_total', outcome=outcome)
+    return result
+
+def save_result(result_id, result):
+    result_cache.put(result_id, result)
+    with registry.stage('store'):
+        result_store.save(result_id, result)
+
+def upload_digest(upload):
+    """Content hash of an upload, computed while it was spooled when possible."""
+    stream = upload.stream
+    if isinstance(stream, HashingUploadBuffer):
+        return stream.hexdigest()
+    sha256 = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(64 * 1024), b''):
+        sha256.update(chunk)
+    stream.seek(0)
+    return sha256.hexdigest()
+
+class UploadError(Exception):
+    pass
+
+def parse_account(value):
+    """Normalise an account name as typed (case, leading @); None if empty, UploadError if invalid."""
+    account = normalize_username(value).lstrip('@')
+    if account and not ACCOUNT_NAME.fullmatch(account):
+        raise UploadError("That doesn't look like an instagram username.")
+    return account or None
+
+def get_account():
+    """The optional account name snapshots are recorded under."""
+    return parse_account(request.values.get('account', ''))
+
+def get_owner(create=False):
+    """The caller's owner token from its cookie; with create, a new one is issued on the response if missing."""
+    owner = g.get('new_owner') or request.cookies.get(OWNER_COOKIE, '')
+    if OWNER_TOKEN.fullmatch(owner):
+        return owner
+    if not create:
+        return None
+    g.new_owner = secrets.token_urlsafe(32)
+    return g.new_owner
+
+def history_key(account, create=False):
+    """Key of account's snapshot history for this caller, or None without an account or owner token."""
+    owner = account and get_owner(create)
+    if not owner:
+        return None
+    return f"{hashlib.sha256(owner.encode()).hexdigest()}:{account}"
+
+def get_uploads():
+    """Return (result_id, uploads) for the posted files, where uploads are read_uploads() kwargs."""
+    export_zip = request.files.get('export_zip')
+    followers_file = request.files.get('followers_file')
+    following_file = request.files.get('following_file')
+
+    if export_zip:
+        cache_key = ('zip', upload_digest(export_zip))
+        uploads = {'export_zip': export_zip}
+    elif followers_file and following_file:
+        cache_key = (upload_digest(followers_file), upload_digest(following_file))
+        uploads = {'followers': followers_file, 'following': following_file}
+    else:
+        raise UploadError("Please upload your export ZIP, or both files: followers_1.json and following.json")
+    return make_result_id(cache_key), uploads
+
+def detach_upload(upload):
+    """Take ownership of an upload's buffer so it outlives the request."""
+    stream = upload.stream
+    upload.stream = io.BytesIO()
+    return stream, upload.filename
+
+def reusable_result(result_id, history):
+    """The saved result of these uploads, or None when they have to be analysed.
 
-UPLOAD_FOLDER = 'uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    Uploads not yet snapshotted into ``history`` are analysed again so the
+    snapshot can be taken.
+    """
+    if history and snapshot_store.find(history, result_id) is None:
+        return None
+    return load_result(result_id)
+
+def run_analysis(result_id, uploads, history=None, progress=None):
+    """Parse and diff the uploads, save the result and, given a history key, a snapshot."""
+    followers, following = read_uploads(progress=progress, **uploads)
+    result = diff_usernames(followers, following)
+    save_result(result_id, result)
+    if history:
+        with registry.stage('snapshot_save'):
+            snapshot_store.save(history, result_id, followers, following)
+    return result
+
+def run_analysis_job(progress, result_id, uploads, history):
+    try:
+        run_analysis(result_id, uploads, history, progress)
+    finally:
+        registry.flush(force=True)
+    return result_id
+
+def snapshot_changes(account, result_id):
+    """What changed in the caller's history of account between the previous snapshot and this result's, if any."""
+    history = history_key(account)
+    if not history:
+        return None
+    snapshot_id = snapshot_store.find(history, result_id)
+    previous_id = snapshot_id and snapshot_store.previous(history, snapshot_id)
+    if not previous_id:
+        return None
+    with registry.stage('snapshot_diff'):
+        changes = snapshot_store.diff(history, previous_id, snapshot_id)
+    changes['account'] = account
+    return changes
+
+def render_result(result_id, result, account=None):
+    changes = snapshot_changes(account, result_id)
+    with registry.stage('render'):
+        return render_template('index.html', result=result, result_id=result_id, changes=changes)
+
+def receive_uploads():
+    """get_account() and get_uploads(), timed as the stage that reads the request body."""
+    with registry.stage('receive'):
+        return get_account(), *get_uploads()
 
-def load_json_from_path(file_path):
+def start_profiler():
+    profiler = cProfile.Profile()
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-            print(f"Loaded {len(data) if isinstance(data, list) else 'entries in dict'} from {file_path}")
-            return data
-    except Exception as e:
-        print(f"Error loading JSON: {e}")
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active in this process
         return None
+    return profiler
 
-def extract_usernames(json_data, data_type):
-    usernames = set()
-    entries = json_data
-    if data_type == "following":
-        entries = json_data.get("relationships_following", [])
-    if isinstance(entries, list):
-        for entry in entries:
-            string_list = entry.get("string_list_data", [])
-            for item in string_list:
-                if isinstance(item, dict):
-                    value = item.get("value")
-                    if value:
-                        usernames.add(value.lower().strip())
-    return usernames
+def dump_profile(profiler, elapsed):
+    profile_dir = app.config['PROFILE_DIR']
+    os.makedirs(profile_dir, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unknown'}-{elapsed * 1000:.0f}ms-{os.getpid()}.prof"
+    profiler.dump_stats(os.path.join(profile_dir, name))
+    app.logger.warning("Slow request %s %s took %.2fs, profile saved to %s", request.method, request.path, elapsed, name)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.profiler = start_profiler() if app.config['PROFILE_SLOW_REQUESTS'] is not None else None
+
+@app.after_request
+def record_status(response):
+    g.response_status = response.status_code
+    return response
+
+@app.after_request
+def set_owner_cookie(response):
+    owner = g.get('new_owner')
+    if owner:
+        response.set_cookie(OWNER_COOKIE, owner, max_age=OWNER_COOKIE_MAX_AGE, secure=request.is_secure,
+                            httponly=True, samesite='Lax')
+    return response
+
+@app.teardown_request
+def record_request(exc):
+    """Record request latency, dump a profile of slow requests and publish this worker's metrics."""
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        if elapsed >= app.config['PROFILE_SLOW_REQUESTS']:
+            dump_profile(profiler, elapsed)
+    endpoint = request.endpoint or 'unknown'
+    registry.observe('fan_request_duration_seconds', elapsed, endpoint=endpoint)
+    registry.inc('fan_requests_total', endpoint=endpoint, status=g.pop('response_status', 500))
+    registry.flush(force=endpoint in ANALYSIS_ENDPOINTS and request.method == 'POST')
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
-    result = None
     if request.method == 'POST':
-        followers_file = request.files.get('followers_file')
-        following_file = request.files.get('following_file')
+        try:
+            account, result_id, uploads = receive_uploads()
+        except UploadError as e:
+            flash(str(e))
+            return redirect(url_for('index'))
 
-        if not followers_file or not following_file:
-            flash("Please upload both files: followers_1.json and following.json")
+        history = history_key(account, create=True)
+        result = reusable_result(result_id, history)
+        if result is None:
+            streams = {key: (upload.stream, upload.filename) for key, upload in uploads.items()}
+            try:
+                result = run_analysis(result_id, streams, history)
+            except AnalysisError as e:
+                flash(str(e))
+                return redirect(url_for('index'))
+        return render_result(result_id, result, account)
+
+    result_id = request.args.get('result')
+    if result_id:
+        result = load_result(result_id)
+        if result is None:
+            flash("Result not found or expired, please upload your files again.")
             return redirect(url_for('index'))
+        try:
+            account = get_account()
+        except UploadError:
+            account = None
+        return render_result(result_id, result, account)
 
-        followers_path = os.path.join(app.config['UPLOAD_FOLDER'], 'followers_1_uploaded.json')
-        following_path = os.path.join(app.config['UPLOAD_FOLDER'], 'following_uploaded.json')
+    return render_template('index.html', result=None)
 
-        followers_file.save(followers_path)
-        following_file.save(following_path)
+def api_error(message, status):
+    return jsonify({'error': message}), status
 
-        followers_data = load_json_from_path(followers_path)
-        following_data = load_json_from_path(following_path)
+def job_status(job):
+    status = {key: job[key] for key in ('job_id', 'status', 'bytes_parsed', 'records_seen', 'error')}
+    if job['result_id']:
+        status['result_id'] = job['result_id']
+        status['result_url'] = url_for('index', result=job['result_id'])
+    return status
 
-        if not followers_data or not following_data:
-            flash("Error reading one or both JSON files.")
-            return redirect(url_for('index'))
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Start an analysis in the background and return its job id straight away."""
+    try:
+        account, result_id, uploads = receive_uploads()
+    except UploadError as e:
+        return api_error(str(e), 400)
+
+    history = history_key(account, create=True)
+    if reusable_result(result_id, history) is not None:
+        job_id = job_queue.completed(result_id)
+    else:
+        streams = {key: detach_upload(upload) for key, upload in uploads.items()}
 
-        followers_usernames = extract_usernames(followers_data, data_type="followers")
-        following_usernames = extract_usernames(following_data, data_type="following")
+        def close_streams():
+            for stream, _ in streams.values():
+                stream.close()
 
-        print(f"Followers count: {len(followers_usernames)}")
-        print(f"Following count: {len(following_usernames)}")
+        try:
+            job_id = job_queue.submit(run_analysis_job, result_id, streams, history, cleanup=close_streams)
+        except QueueFull:
+            close_streams()
+            return api_error("Too many analyses running, please try again in a moment.", 503)
 
-        not_following_back = sorted(following_usernames - followers_usernames)
-        not_followed_back = sorted(followers_usernames - following_usernames)
-        mutuals = sorted(followers_usernames & following_usernames)
+    response = jsonify(job_status(job_queue.get(job_id)))
+    response.headers['Location'] = url_for('get_job', job_id=job_id)
+    return response, 202
 
-        result = {
-            'not_following_back': not_following_back,
-            'not_followed_back': not_followed_back,
-            'mutuals': mutuals
-        }
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return api_error("Job not found or expired.", 404)
+    return jsonify(job_status(job))
+
+@app.route('/api/results/<result_id>')
+def result_summary(result_id):
+    result = load_result(result_id)
+    if result is None:
+        return api_error("Result not found or expired, please upload your files again.", 404)
+    return jsonify({
+        'result_id': result_id,
+        'counts': {category: len(result[category]) for category in RESULT_CATEGORIES},
+    })
+
+@app.route('/api/results/<result_id>/<category>')
+def result_page(result_id, category):
+    """One cursor page of a result category, optionally filtered by ?q=&mode=prefix|substring."""
+    if category not in RESULT_CATEGORIES:
+        return api_error(f"Unknown category: {category}", 404)
+    try:
+        cursor = int(request.args.get('cursor', 0))
+        limit = int(request.args.get('limit', app.config['RESULTS_PAGE_SIZE']))
+    except ValueError:
+        return api_error("cursor and limit must be integers", 400)
+    if cursor < 0 or limit < 1:
+        return api_error("cursor must be >= 0 and limit >= 1", 400)
+    limit = min(limit, app.config['RESULTS_MAX_PAGE_SIZE'])
+    query = normalize_username(request.args.get('q', ''))
+    mode = request.args.get('mode', 'prefix')
+    if mode not in SEARCH_MODES:
+        return api_error(f"mode must be one of: {', '.join(SEARCH_MODES)}", 400)
+
+    result = load_result(result_id)
+    if result is None:
+        return api_error("Result not found or expired, please upload your files again.", 404)
+    index = result[category]
+    if query:
+        usernames, next_cursor = index.search(query, mode, cursor, limit)
+    else:
+        usernames, next_cursor = index.page(cursor, limit)
+    return jsonify({
+        'category': category,
+        'total': len(index),
+        'usernames': usernames,
+        'next_cursor': next_cursor,
+    })
+
+def profile_url(username):
+    return f'https://www.instagram.com/{username}'
+
+def export_rows(result, categories, batch_size):
+    """Yield batches of EXPORT_COLUMNS tuples, never holding more than one batch of rows."""
+    for category in categories:
+        for rows in result[category].iter_rows(batch_size):
+            yield [(category, username, profile_url(username), followers, following)
+                   for username, followers, following in rows]
+
+def export_csv(result, categories, batch_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The header goes out before any rows are read
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    for rows in export_rows(result, categories, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+def export_jsonl(result, categories, batch_size):
+    for rows in export_rows(result, categories, batch_size):
+        yield ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n' for row in rows)
+
+@app.route('/api/results/<result_id>/download.<fmt>')
+@app.route('/api/results/<result_id>/<category>/download.<fmt>')
+def download_result(result_id, fmt, category=None):
+    """Stream one category, or all of them, as CSV or JSON Lines."""
+    if fmt not in EXPORT_FORMATS:
+        return api_error(f"format must be one of: {', '.join(EXPORT_FORMATS)}", 404)
+    if category is not None and category not in RESULT_CATEGORIES:
+        return api_error(f"Unknown category: {category}", 404)
+    result = load_result(result_id)
+    if result is None:
+        return api_error("Result not found or expired, please upload your files again.", 404)
+
+    categories = (category,) if category else RESULT_CATEGORIES
+    export = export_csv if fmt == 'csv' else export_jsonl
+    registry.inc('fan_downloads_total', format=fmt)
+    response = Response(export(result, categories, app.config['EXPORT_BATCH_SIZE']), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{category or "all"}-{result_id[:8]}.{fmt}"'
+    return response
+
+@app.route('/api/results/<result_id>/timeline')
+def result_timeline(result_id):
+    """Followers, follows and mutuals formed per ?granularity=day|week|month, plus celebrity ages."""
+    granularity = request.args.get('granularity', 'week')
+    if granularity not in GRANULARITIES:
+        return api_error(f"granularity must be one of: {', '.join(GRANULARITIES)}", 400)
+    result = load_result(result_id)
+    if result is None:
+        return api_error("Result not found or expired, please upload your files again.", 404)
+    with registry.stage('timeline'):
+        return jsonify({'result_id': result_id, **timeline(result, granularity)})
+
+@app.route('/results/<result_id>/timeline')
+def timeline_page(result_id):
+    if load_result(result_id) is None:
+        flash("Result not found or expired, please upload your files again.")
+        return redirect(url_for('index'))
+    return render_template('timeline.html', result_id=result_id, granularities=GRANULARITIES)
+
+@app.route('/api/accounts/<account>/snapshots')
+def account_snapshots(account):
+    """The caller's own snapshots of account; other callers' uploads of the same name are not visible."""
+    try:
+        account = parse_account(account)
+    except UploadError as e:
+        return api_error(str(e), 400)
+    history = history_key(account)
+    return jsonify({'account': account, 'snapshots': snapshot_store.history(history) if history else []})
+
+@app.route('/api/accounts/<account>/diff')
+def account_diff(account):
+    """Changes between two of the caller's snapshots; defaults to the latest one and the one before it."""
+    try:
+        account = parse_account(account)
+    except UploadError as e:
+        return api_error(str(e), 400)
+    history = history_key(account)
+    if not history:
+        return api_error("Need at least two snapshots of this account to compare.", 404)
+    try:
+        new_id = request.args.get('to', type=int)
+        if new_id is None:
+            snapshots = snapshot_store.history(history)
+            new_id = snapshots[0]['snapshot_id'] if snapshots else None
+        old_id = request.args.get('from', type=int) or (new_id and snapshot_store.previous(history, new_id))
+        if not new_id or not old_id:
+            return api_error("Need at least two snapshots of this account to compare.", 404)
+        changes = snapshot_store.diff(history, old_id, new_id)
+    except KeyError as e:
+        return api_error(f"Unknown snapshot: {e.args[0]}", 404)
+    return jsonify({'account': account, 'from': old_id, 'to': new_id, **changes})
 
-    return render_template('index.html', result=result)
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint, summed over all workers."""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     app.run(debug=True)
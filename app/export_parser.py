@@ -0,0 +1,193 @@
+"""Incremental reader for Instagram follower/following exports.
+
+Instead of ``json.load``-ing a whole export and then walking the tree, the
+reader decodes one record of the top-level records array at a time, so peak
+memory depends on the size of a single record rather than the whole file.
+"""
+import codecs
+import json
+import re
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Top-level keys of dict-shaped exports (following.json etc.) that hold records
+RECORD_KEYS = ("following", "followers")
+RECORD_KEY_PREFIX = "relationships_"
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# What may still follow a number that was cut off at the end of a chunk ("1." | "5e3")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+# C0/C1 control characters; "\n" in particular would split a name in two in the newline-joined stores
+_CONTROL_CHARS = dict.fromkeys([*range(0x20), *range(0x7f, 0xa0)])
+
+
+def is_record_key(key):
+    return isinstance(key, str) and (key.startswith(RECORD_KEY_PREFIX) or key in RECORD_KEYS)
+
+
+def normalize_username(value):
+    if not value.isprintable():
+        value = value.translate(_CONTROL_CHARS)
+    return value.lower().strip()
+
+
+def collect_usernames(pairs):
+    """Map normalised usernames to their follow timestamp (None when missing); names left empty are dropped."""
+    usernames = {normalize_username(value): timestamp for value, timestamp in pairs}
+    usernames.pop("", None)
+    return usernames
+
+
+def record_usernames(record):
+    """Yield (username, timestamp) pairs from a single export record.
+
+    Followers exports keep the username in ``string_list_data[].value``, newer
+    following exports only have it in the record ``title``.
+    """
+    title = record.get("title") or None
+    found = False
+    items = record.get("string_list_data")
+    if isinstance(items, list):
+        for item in items:
+            if isinstance(item, dict):
+                value = item.get("value") or title
+                if value:
+                    found = True
+                    yield value, item.get("timestamp")
+    if not found and title:
+        yield title, None
+
+
+class UsernameStream:
+    """Iterate (username, timestamp) pairs from an export file object.
+
+    ``fp`` may be opened in binary or text mode. While iterating, ``bytes_read``
+    and ``records`` report progress; ``root_key`` is the top-level key the
+    records were found under (None for list-shaped exports) and ``sample`` is
+    the first record seen. ``progress``, if given, is called after every chunk
+    with the bytes and records added since the previous call.
+    """
+
+    def __init__(self, fp, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._progress = progress
+        self._reported_records = 0
+        self._text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._json_decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self.bytes_read = 0
+        self.records = 0
+        self.root_key = None
+        self.sample = None
+
+    def __iter__(self):
+        for record in self.iter_records():
+            yield from record_usernames(record)
+
+    def iter_records(self):
+        """Yield each record dict of the export's records array."""
+        first = self._peek()
+        if first == "[":
+            yield from self._iter_array()
+        elif first == "{":
+            yield from self._iter_object()
+        elif not first:
+            raise ValueError("Export is empty")
+        else:
+            raise ValueError("Export must be a JSON array or object")
+        self._report_progress(0)
+
+    def _iter_object(self):
+        self._pos += 1
+        while True:
+            char = self._peek()
+            if char == "}":
+                self._pos += 1
+                return
+            if char == ",":
+                self._pos += 1
+                continue
+            if not char:
+                raise ValueError("Unexpected end of export")
+            key = self._decode_value()
+            if self._peek() != ":":
+                raise ValueError(f"Expected ':' after key {key!r}")
+            self._pos += 1
+            if self.root_key is None and is_record_key(key) and self._peek() == "[":
+                self.root_key = key
+                yield from self._iter_array()
+            else:
+                self._decode_value()
+
+    def _iter_array(self):
+        self._pos += 1
+        while True:
+            char = self._peek()
+            if char == "]":
+                self._pos += 1
+                return
+            if char == ",":
+                self._pos += 1
+                continue
+            if not char:
+                raise ValueError("Unexpected end of export")
+            record = self._decode_value()
+            self.records += 1
+            if self.sample is None:
+                self.sample = record
+            if isinstance(record, dict):
+                yield record
+
+    def _peek(self):
+        """Skip whitespace and return the next character, or '' at the end."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _decode_value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                if self._fill(len(self._buf) - self._pos):
+                    continue
+                raise ValueError(f"Malformed export: {e}") from None
+            # A number cut at the end of the buffer may continue in the next chunk, even
+            # when raw_decode accepted a shorter number and left only its tail ("1." | "5e3")
+            if (end == len(self._buf) or (isinstance(value, (int, float)) and not isinstance(value, bool)
+                                          and _NUMBER_TAIL.fullmatch(self._buf, end))) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _fill(self, pending=0):
+        """Append the next chunk to the buffer; return False once input is exhausted.
+
+        Reads grow with ``pending`` so a value spanning many chunks is decoded in
+        amortised linear time.
+        """
+        if self._eof:
+            return False
+        chunk = self._fp.read(max(self._chunk_size, pending))
+        if chunk:
+            self.bytes_read += len(chunk)
+            text = chunk if isinstance(chunk, str) else self._text_decoder.decode(chunk)
+        else:
+            self._eof = True
+            text = self._text_decoder.decode(b"", final=True)
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        self._report_progress(len(chunk))
+        return bool(chunk) or bool(text)
+
+    def _report_progress(self, bytes_read):
+        if self._progress is not None:
+            self._progress(bytes_read, self.records - self._reported_records)
+            self._reported_records = self.records
@@ -0,0 +1,247 @@
+"""Locate and read follower/following files in an export folder or ZIP archive.
+
+Instagram splits large follower lists across ``followers_1.json``,
+``followers_2.json``, ... Every part is read straight out of the folder or
+archive (nothing is extracted to disk) and, when there is more than one part,
+parsed concurrently in a process pool.
+
+Folders are scanned once with os.scandir, skipping media subtrees, and the
+list of candidate files is cached until one of the scanned directories changes.
+"""
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+from export_parser import UsernameStream, collect_usernames
+
+FOLLOWERS_NAME = re.compile(r"followers(?:_(\d+))?\.json")
+FOLLOWING_NAME = "following.json"
+
+# Export subtrees that only hold photos and videos, never connection JSON
+MEDIA_DIRS = frozenset({"media", "photos", "videos", "reels", "stories", "igtv"})
+
+MANIFEST_CACHE_SIZE = 32
+POOL_MAX_WORKERS = 4
+
+# What a truncated or corrupt export can raise while a member is read; encrypted
+# members are turned into ValueError by ExportSource.open
+READ_ERRORS = (OSError, ValueError, EOFError, NotImplementedError, zipfile.BadZipFile, zlib.error)
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+_manifests = OrderedDict()
+_manifests_lock = threading.Lock()
+
+
+def classify_member(name):
+    """Return ('followers', part) / ('following', 0) for connection files, else None."""
+    basename = name.replace("\\", "/").rsplit("/", 1)[-1].lower()
+    if basename == FOLLOWING_NAME:
+        return "following", 0
+    match = FOLLOWERS_NAME.fullmatch(basename)
+    if match:
+        return "followers", int(match.group(1) or 0)
+    return None
+
+
+def scan_folder(path):
+    """One scandir pass over an export folder.
+
+    Returns (candidates, directories): the relative paths of every followers /
+    following file, and the mtime of every directory that was scanned.
+    """
+    candidates = []
+    directories = {}
+    pending = [""]
+    while pending:
+        relative = pending.pop()
+        directory = os.path.join(path, relative) if relative else path
+        directories[directory] = os.stat(directory).st_mtime_ns
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                name = os.path.join(relative, entry.name) if relative else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name.lower() not in MEDIA_DIRS:
+                        pending.append(name)
+                elif classify_member(entry.name) is not None:
+                    candidates.append(name)
+    return candidates, directories
+
+
+def _manifest_is_fresh(directories):
+    try:
+        return all(os.stat(directory).st_mtime_ns == mtime for directory, mtime in directories.items())
+    except OSError:
+        return False
+
+
+def folder_manifest(path):
+    """Candidate connection files of a folder, rescanned only when a scanned directory's mtime changed."""
+    key = os.path.abspath(path)
+    with _manifests_lock:
+        cached = _manifests.get(key)
+    if cached is not None and _manifest_is_fresh(cached[1]):
+        with _manifests_lock:
+            _manifests.move_to_end(key)
+        return cached[0]
+    candidates, directories = scan_folder(key)
+    with _manifests_lock:
+        _manifests[key] = (candidates, directories)
+        _manifests.move_to_end(key)
+        while len(_manifests) > MANIFEST_CACHE_SIZE:
+            _manifests.popitem(last=False)
+    return candidates
+
+
+def _member_rank(name):
+    # Prefer the shallowest copy when a part appears more than once
+    return name.replace("\\", "/").count("/"), name
+
+
+class ExportSource:
+    """A raw Instagram export: a folder, a ZIP path or a binary ZIP file object.
+
+    ``followers`` lists the followers part members in part order and
+    ``following`` is the following member (or None). ``path`` is set when the
+    export can be reopened by other processes.
+    """
+
+    def __init__(self, location):
+        self.location = location
+        self._zip = None
+        if isinstance(location, (str, os.PathLike)):
+            self.path = os.fspath(location)
+            self.is_zip = not os.path.isdir(self.path)
+        else:
+            name = getattr(location, "name", None)
+            self.path = name if isinstance(name, str) and os.path.isfile(name) else None
+            self.is_zip = True
+        if self.is_zip:
+            try:
+                self._zip = zipfile.ZipFile(location)
+            except zipfile.BadZipFile as e:
+                raise ValueError(f"Not a ZIP export: {e}") from None
+            names = [info.filename for info in self._zip.infolist() if not info.is_dir()]
+        else:
+            names = folder_manifest(self.path)
+        self.followers, self.following = self._find_members(names)
+
+    @staticmethod
+    def _find_members(names):
+        parts = {}
+        following = None
+        for name in names:
+            kind = classify_member(name)
+            if kind is None:
+                continue
+            if kind[0] == "following":
+                if following is None or _member_rank(name) < _member_rank(following):
+                    following = name
+            elif kind[1] not in parts or _member_rank(name) < _member_rank(parts[kind[1]]):
+                parts[kind[1]] = name
+        return [parts[part] for part in sorted(parts)], following
+
+    def open(self, member):
+        """Open a member for binary reading, straight from the folder or archive."""
+        if self._zip is not None:
+            try:
+                return self._zip.open(member)
+            except RuntimeError as e:
+                # zipfile signals an encrypted member with a bare RuntimeError
+                raise ValueError(f"Cannot read {member}: {e}") from None
+        return open(os.path.join(self.path, member), "rb")
+
+    def display_name(self, member):
+        return member.replace("\\", "/").rsplit("/", 1)[-1]
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_member_usernames(source, member, progress=None):
+    """Parse one member into a {username: timestamp} map."""
+    with source.open(member) as file:
+        return collect_usernames(UsernameStream(file, progress=progress))
+
+
+def _open_part(path, is_zip, member):
+    if is_zip:
+        with ExportSource(path) as source:
+            return source.open(member)
+    # A folder member is a known relative path, so there is nothing to scan
+    return open(os.path.join(path, member), "rb")
+
+
+def _read_part(path, is_zip, member):
+    # Runs in a pool worker: reopen the export by path and parse a single part
+    with _open_part(path, is_zip, member) as file:
+        stream = UsernameStream(file)
+        usernames = collect_usernames(stream)
+        return usernames, stream.bytes_read, stream.records
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # The web app calls this from threaded workers, where fork() could copy a held lock into the child
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=min(POOL_MAX_WORKERS, os.cpu_count() or 1),
+                                        mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def _discard_pool(pool):
+    """Drop a broken pool so the next _get_pool() starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def read_followers(source, progress=None, parallel=True, members=None):
+    """Merge every followers part (or just ``members``) into one {username: timestamp} map.
+
+    Parts are parsed in parallel when there are several of them, the export
+    can be reopened by path and ``parallel`` is set (callers that already run
+    in a pool worker turn it off); otherwise they are read in-process. Pooled
+    parts report ``progress`` once each, as they finish. If a pool process
+    dies, the pool is replaced for later calls and the remaining parts are
+    read in-process.
+    """
+    members = source.followers if members is None else members
+    usernames = {}
+    if parallel and len(members) > 1 and source.path is not None:
+        pool = _get_pool()
+        done = 0
+        try:
+            for part, bytes_read, records in pool.map(_read_part, repeat(source.path), repeat(source.is_zip), members):
+                usernames |= part
+                done += 1
+                if progress is not None:
+                    progress(bytes_read, records)
+        except BrokenProcessPool:
+            logger.exception("Parse pool broke after %d of %d parts; reading the rest in-process", done, len(members))
+            _discard_pool(pool)
+        members = members[done:]
+    for member in members:
+        usernames |= read_member_usernames(source, member, progress)
+    return usernames
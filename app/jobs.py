@@ -0,0 +1,155 @@
+"""Background analysis jobs with SQLite-backed status so any worker can report on them."""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    bytes_parsed INTEGER NOT NULL DEFAULT 0,
+    records_seen INTEGER NOT NULL DEFAULT 0,
+    result_id TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated);
+"""
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """This worker already has as many jobs as it is allowed to hold."""
+
+
+class JobProgress:
+    """Progress callback for a running job, written through at most every ``interval`` seconds."""
+
+    def __init__(self, queue, job_id, interval=0.5):
+        self._queue = queue
+        self._job_id = job_id
+        self._interval = interval
+        self._last_flush = 0.0
+        self.bytes_parsed = 0
+        self.records_seen = 0
+
+    def __call__(self, bytes_read, records):
+        self.bytes_parsed += bytes_read
+        self.records_seen += records
+        now = time.monotonic()
+        if now - self._last_flush >= self._interval:
+            self.flush()
+            self._last_flush = now
+
+    def flush(self):
+        self._queue._update(self._job_id, bytes_parsed=self.bytes_parsed, records_seen=self.records_seen)
+
+
+class JobQueue:
+    """Run analyses on a bounded thread pool, tracking them in a SQLite table.
+
+    At most ``max_workers`` jobs run at once in each process, and at most
+    ``max_pending`` may be queued or running before ``submit`` raises
+    QueueFull. Jobs not updated for ``ttl`` seconds are deleted, including
+    ones orphaned by a worker that died. Messages of ``user_errors`` exceptions
+    are reported back as the job error; anything else becomes a generic one.
+    """
+
+    def __init__(self, path, max_workers=2, max_pending=16, ttl=3600, user_errors=()):
+        self.path = path
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.user_errors = user_errors
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self._pending = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, sql, params=()):
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _update(self, job_id, **fields):
+        fields['updated'] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def _create(self, status, **fields):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        fields.update(job_id=job_id, status=status, created=now, updated=now)
+        columns = ", ".join(fields)
+        placeholders = ", ".join("?" for _ in fields)
+        self._execute(f"INSERT INTO jobs ({columns}) VALUES ({placeholders})", tuple(fields.values()))
+        return job_id
+
+    def submit(self, func, *args, cleanup=None):
+        """Queue ``func(progress, *args)``, which must return a result id.
+
+        ``cleanup`` runs once the job has finished, whatever the outcome.
+        """
+        self.cleanup_expired()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull()
+            self._pending += 1
+        try:
+            job_id = self._create(QUEUED)
+            self._executor.submit(self._run, job_id, func, args, cleanup)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return job_id
+
+    def completed(self, result_id):
+        """Record a job that needed no work, e.g. because its result was cached."""
+        return self._create(DONE, result_id=result_id)
+
+    def _run(self, job_id, func, args, cleanup):
+        progress = JobProgress(self, job_id)
+        try:
+            self._update(job_id, status=RUNNING)
+            result_id = func(progress, *args)
+            progress.flush()
+            self._update(job_id, status=DONE, result_id=result_id)
+        except self.user_errors as e:
+            self._update(job_id, status=FAILED, error=str(e))
+        except Exception:
+            logger.exception("Job %s failed", job_id)
+            self._update(job_id, status=FAILED, error="Analysis failed.")
+        finally:
+            with self._lock:
+                self._pending -= 1
+            if cleanup is not None:
+                cleanup()
+
+    def get(self, job_id):
+        rows = self._execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+        return dict(rows[0]) if rows else None
+
+    def cleanup_expired(self):
+        self._execute("DELETE FROM jobs WHERE updated < ?", (time.time() - self.ttl,))
@@ -0,0 +1,255 @@
+"""Counters and latency histograms exposed in the Prometheus text format.
+
+Every process keeps its own registry and writes it to
+``<directory>/worker-<pid>-<start id>.json`` when flushed, at most once per
+``flush_interval`` unless forced; rendering sums the files of all workers,
+the same way prometheus_client's multiprocess mode aggregates gunicorn
+workers. The random start id keeps a new process that reuses a dead worker's
+pid from overwriting that worker's file.
+
+As with prometheus_client, the server has to manage the directory:
+``clear_directory()`` before any worker starts and ``mark_process_dead(pid)``
+when one exits, which folds its counters into a single ``dead-workers.json``
+so they keep counting without a file per process ever started. The gunicorn
+hooks in gunicorn.conf.py do both.
+"""
+import glob
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+DEAD_WORKERS_FILE = "dead-workers.json"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+
+HELP = {
+    "fan_stage_duration_seconds": "Time spent in each stage of an analysis.",
+    "fan_stage_errors_total": "Stages that ended with an exception.",
+    "fan_request_duration_seconds": "HTTP request latency by endpoint.",
+    "fan_requests_total": "HTTP requests by endpoint and status code.",
+    "fan_bytes_processed_total": "Export bytes read by the parser.",
+    "fan_records_processed_total": "Export records decoded by the parser.",
+    "fan_usernames_total": "Usernames extracted, by side.",
+    "fan_result_cache_requests_total": "Result lookups by outcome.",
+    "fan_downloads_total": "Result downloads by format.",
+    "fan_result_cache_hits_total": "Lookups answered by a worker's in-memory result cache.",
+    "fan_result_cache_misses_total": "Lookups the in-memory result cache could not answer.",
+    "fan_result_cache_evictions_total": "Results evicted from the in-memory cache to stay within its limits.",
+}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _read_state(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _sum_states(states):
+    """(counters, histograms) summed over registry states, keyed by (name, labels)."""
+    counters = {}
+    histograms = {}
+    for state in states:
+        for name, labels, value in state["counters"]:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total, count in state["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            merged[1] += total
+            merged[2] += count
+    return counters, histograms
+
+
+class Metrics:
+    """Thread-safe in-process registry that can be shared with other workers through files."""
+
+    def __init__(self, directory=None, buckets=DEFAULT_BUCKETS, flush_interval=5.0):
+        self.directory = directory
+        self.buckets = buckets
+        self.flush_interval = flush_interval
+        self._flushed = None
+        self._file_pid = None
+        self._file_name = None
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block as one pipeline stage; exceptions count as stage errors."""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc("fan_stage_errors_total", stage=name)
+            raise
+        finally:
+            self.observe("fan_stage_duration_seconds", time.perf_counter() - start, stage=name)
+
+    def progress(self, forward=None):
+        """A parser progress callback that counts bytes and records, then calls ``forward``."""
+        def callback(bytes_read, records):
+            self.inc("fan_bytes_processed_total", bytes_read)
+            self.inc("fan_records_processed_total", records)
+            if forward is not None:
+                forward(bytes_read, records)
+        return callback
+
+    def register(self, collect):
+        """Add counters kept elsewhere; ``collect()`` returns (name, value, labels) tuples when flushing."""
+        self._collectors.append(collect)
+
+    def _state(self):
+        with self._lock:
+            state = {
+                "counters": [[name, labels, value] for (name, labels), value in self._counters.items()],
+                "histograms": [[name, labels, h["buckets"], h["sum"], h["count"]]
+                               for (name, labels), h in self._histograms.items()],
+            }
+            collectors = list(self._collectors)
+        for collect in collectors:
+            state["counters"].extend([name, _label_key(labels), value] for name, value, labels in collect())
+        return state
+
+    def _own_file(self):
+        # A forked child inherits the parent's registry, so the name is picked again whenever the pid changes
+        pid = os.getpid()
+        with self._lock:
+            if self._file_pid != pid:
+                self._file_pid = pid
+                self._file_name = f"worker-{pid}-{uuid.uuid4().hex[:12]}.json"
+                self._flushed = None
+            return self._file_name
+
+    def flush(self, force=False):
+        """Write this process's registry where other workers can read it.
+
+        Without ``force`` nothing is written if the last write was less than
+        ``flush_interval`` seconds ago.
+        """
+        if self.directory is None:
+            return
+        own_file = self._own_file()
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._flushed is not None and now - self._flushed < self.flush_interval:
+                return
+            self._flushed = now
+        self._write(own_file, self._state())
+
+    def _write(self, name, state):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump(state, file)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+
+    def mark_process_dead(self, pid):
+        """Fold the files of the exited process ``pid`` into the dead-workers file and delete them.
+
+        Only one process may call this at a time; gunicorn runs its
+        child_exit hook in the arbiter, one worker at a time.
+        """
+        if self.directory is None:
+            return
+        paths = glob.glob(os.path.join(self.directory, f"worker-{pid}-*.json"))
+        if not paths:
+            return
+        states = map(_read_state, [os.path.join(self.directory, DEAD_WORKERS_FILE), *paths])
+        counters, histograms = _sum_states(state for state in states if state is not None)
+        self._write(DEAD_WORKERS_FILE, {
+            "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+            "histograms": [[name, labels, *histogram] for (name, labels), histogram in histograms.items()],
+        })
+        for path in paths:
+            os.remove(path)
+
+    def clear_directory(self):
+        """Delete every worker and dead-workers file; call before the first worker starts."""
+        if self.directory is None:
+            return
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            os.remove(path)
+
+    def _collect(self):
+        """Sum the registries of every worker, this one taken from memory."""
+        states = [self._state()]
+        own_file = self._own_file()
+        if self.directory is not None:
+            paths = glob.glob(os.path.join(self.directory, "worker-*.json"))
+            paths.append(os.path.join(self.directory, DEAD_WORKERS_FILE))
+            for path in paths:
+                if os.path.basename(path) != own_file:
+                    states.append(_read_state(path))
+        return _sum_states(state for state in states if state is not None)
+
+    def render(self):
+        """Prometheus text exposition of the metrics summed over all workers."""
+        counters, histograms = self._collect()
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, buckets):
+                    cumulative += bucket
+                    le = "+Inf" if math.isinf(bound) else repr(float(bound))
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Shared by the app and the analysis pipeline; the app points it at its metrics directory
+registry = Metrics()
@@ -0,0 +1,86 @@
+"""SQLite-backed store so analysis results are visible to every worker process."""
+import os
+import sqlite3
+import time
+from array import array
+
+from username_index import SIDES, TIMESTAMP_TYPE, UsernameIndex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    result_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    created REAL NOT NULL,
+    names TEXT NOT NULL,
+    followers_timestamps BLOB,
+    following_timestamps BLOB,
+    PRIMARY KEY (result_id, category)
+);
+CREATE INDEX IF NOT EXISTS results_created ON results (created);
+"""
+
+
+def _pack_timestamps(column):
+    return column.tobytes() if column is not None else None
+
+
+def _unpack_timestamps(blob):
+    column = array(TIMESTAMP_TYPE)
+    column.frombytes(blob)
+    return column
+
+
+class ResultStore:
+    """Keep each result category as one newline-joined row, plus its raw timestamp columns, for ``ttl`` seconds."""
+
+    def __init__(self, path, ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Stores created before timestamps were kept lack these columns
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+            for side in SIDES:
+                if f"{side}_timestamps" not in columns:
+                    conn.execute(f"ALTER TABLE results ADD COLUMN {side}_timestamps BLOB")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def save(self, result_id, result):
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO results (result_id, category, created, names, "
+                    "followers_timestamps, following_timestamps) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(result_id, category, now, index.blob,
+                      *(_pack_timestamps(index.timestamps.get(side)) for side in SIDES))
+                     for category, index in result.items()],
+                )
+        finally:
+            conn.close()
+
+    def load(self, result_id):
+        """Return {category: UsernameIndex}, or None if unknown or expired."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT category, names, followers_timestamps, following_timestamps FROM results "
+                "WHERE result_id = ? AND created >= ?",
+                (result_id, time.time() - self.ttl),
+            ).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return None
+        return {
+            category: UsernameIndex.from_blob(names, {
+                side: _unpack_timestamps(blob) for side, blob in zip(SIDES, blobs) if blob is not None
+            })
+            for category, names, *blobs in rows
+        }
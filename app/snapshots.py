@@ -0,0 +1,175 @@
+"""Per-account history of analysed exports, for "what changed since last time" diffs.
+
+A snapshot stores each side (followers / following) as a zlib-compressed,
+newline-joined sorted username list plus a parallel array of follow
+timestamps. Diffs between two snapshots are a linear merge of the sorted
+lists, loading only the columns that are needed.
+
+The ``account`` a snapshot is stored under is an opaque history key; the web
+app derives it from the uploader's owner cookie and the account name, so one
+caller cannot read or add to another caller's history.
+"""
+import os
+import sqlite3
+import time
+import zlib
+from array import array
+
+from username_index import SIDES, TIMESTAMP_TYPE, timestamp_column
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id INTEGER PRIMARY KEY,
+    account TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    created REAL NOT NULL,
+    followers_count INTEGER NOT NULL,
+    following_count INTEGER NOT NULL,
+    followers BLOB NOT NULL,
+    followers_timestamps BLOB NOT NULL,
+    following BLOB NOT NULL,
+    following_timestamps BLOB NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS snapshots_account_digest ON snapshots (account, digest);
+CREATE INDEX IF NOT EXISTS snapshots_account_created ON snapshots (account, created, snapshot_id);
+"""
+
+# Snapshots of one account are mostly identical, so the merge first tries to
+# skip a whole block of equal names with one C-level slice comparison
+MERGE_BLOCK = 64
+
+
+def pack_side(usernames):
+    """Encode a {username: timestamp} map as (names blob, timestamps blob)."""
+    names = sorted(usernames)
+    timestamps = timestamp_column(usernames, names)
+    return zlib.compress("\n".join(names).encode()), zlib.compress(timestamps.tobytes())
+
+
+def unpack_names(blob):
+    text = zlib.decompress(blob).decode()
+    return text.split("\n") if text else []
+
+
+def unpack_timestamps(blob):
+    timestamps = array(TIMESTAMP_TYPE)
+    timestamps.frombytes(zlib.decompress(blob))
+    return timestamps
+
+
+def merge_diff(old, new):
+    """Linear merge of two sorted lists.
+
+    Returns (added, removed): indices into ``new`` of names missing from
+    ``old``, and indices into ``old`` of names missing from ``new``.
+    """
+    added = []
+    removed = []
+    i = j = 0
+    while i < len(old) and j < len(new):
+        block = old[i:i + MERGE_BLOCK]
+        if block == new[j:j + MERGE_BLOCK]:
+            i += len(block)
+            j += len(block)
+        elif old[i] == new[j]:
+            i += 1
+            j += 1
+        elif old[i] < new[j]:
+            removed.append(i)
+            i += 1
+        else:
+            added.append(j)
+            j += 1
+    removed.extend(range(i, len(old)))
+    added.extend(range(j, len(new)))
+    return added, removed
+
+
+class SnapshotStore:
+    """SQLite table of snapshots, indexed by account and upload time."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _query(self, sql, params=()):
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def save(self, account, digest, followers, following):
+        """Store a snapshot unless this account already has one for ``digest``; return its id."""
+        followers_blob, followers_timestamps = pack_side(followers)
+        following_blob, following_timestamps = pack_side(following)
+        self._query(
+            "INSERT OR IGNORE INTO snapshots (account, digest, created, followers_count, following_count, "
+            "followers, followers_timestamps, following, following_timestamps) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (account, digest, time.time(), len(followers), len(following),
+             followers_blob, followers_timestamps, following_blob, following_timestamps),
+        )
+        return self.find(account, digest)
+
+    def find(self, account, digest):
+        rows = self._query("SELECT snapshot_id FROM snapshots WHERE account = ? AND digest = ?", (account, digest))
+        return rows[0]["snapshot_id"] if rows else None
+
+    def history(self, account):
+        """Snapshot summaries for an account, newest first."""
+        rows = self._query(
+            "SELECT snapshot_id, created, followers_count, following_count FROM snapshots "
+            "WHERE account = ? ORDER BY created DESC, snapshot_id DESC",
+            (account,),
+        )
+        return [dict(row) for row in rows]
+
+    def previous(self, account, snapshot_id):
+        """Id of the snapshot taken just before ``snapshot_id``, or None."""
+        rows = self._query(
+            "SELECT s.snapshot_id FROM snapshots s, snapshots cur WHERE cur.snapshot_id = ? "
+            "AND s.account = ? AND cur.account = s.account "
+            "AND (s.created < cur.created OR (s.created = cur.created AND s.snapshot_id < cur.snapshot_id)) "
+            "ORDER BY s.created DESC, s.snapshot_id DESC LIMIT 1",
+            (snapshot_id, account),
+        )
+        return rows[0]["snapshot_id"] if rows else None
+
+    def _load_side(self, account, snapshot_id, side):
+        rows = self._query(
+            f"SELECT {side}, {side}_timestamps FROM snapshots WHERE account = ? AND snapshot_id = ?",
+            (account, snapshot_id),
+        )
+        if not rows:
+            raise KeyError(snapshot_id)
+        return unpack_names(rows[0][0]), unpack_timestamps(rows[0][1])
+
+    def diff(self, account, old_id, new_id):
+        """Followers gained/lost and follows added/removed between two snapshots.
+
+        Added entries carry the timestamp from the newer snapshot, removed ones
+        the timestamp they had in the older one. Raises KeyError for an unknown
+        snapshot.
+        """
+        changes = {}
+        for side, (added_key, removed_key) in zip(SIDES, (("new_followers", "lost_followers"),
+                                                           ("new_following", "removed_following"))):
+            old_names, old_timestamps = self._load_side(account, old_id, side)
+            new_names, new_timestamps = self._load_side(account, new_id, side)
+            added, removed = merge_diff(old_names, new_names)
+            changes[added_key] = [
+                {"username": new_names[i], "timestamp": new_timestamps[i] or None} for i in added
+            ]
+            changes[removed_key] = [
+                {"username": old_names[i], "timestamp": old_timestamps[i] or None} for i in removed
+            ]
+        return changes
@@ -0,0 +1,167 @@
+"""Follow-timeline analytics over the timestamp columns of a result.
+
+Each series (followers, follows, mutuals formed, celebrities) is sorted once
+into an array("q") and cached per UsernameIndex. A histogram is then one
+bisect per bin edge, so building a chart costs O(bins * log n) with no loop
+over individual records. Only the standard library is used; numpy is not a
+dependency of the app.
+"""
+import threading
+import weakref
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from itertools import chain, compress
+from operator import sub
+
+from username_index import TIMESTAMP_TYPE
+
+GRANULARITIES = ("day", "week", "month")
+DAY = 24 * 60 * 60
+# Follow dates outside EARLIEST..now + 1 day are junk from the upload; they are left out of every chart so
+# that one absurd timestamp cannot blow up the number of bins
+EARLIEST = int(datetime(2010, 1, 1, tzinfo=timezone.utc).timestamp())
+
+# (upper bound in days, label) buckets for how long ago a celebrity was followed
+CELEBRITY_AGES = ((30, "under a month"), (182, "1-6 months"), (365, "6-12 months"),
+                  (2 * 365, "1-2 years"), (5 * 365, "2-5 years"), (None, "5+ years"))
+OLDEST_CELEBRITIES = 20
+
+_sorted_columns = weakref.WeakKeyDictionary()
+_sorted_columns_lock = threading.Lock()
+
+
+def _known(timestamps):
+    """Sorted array of the non-zero (known) timestamps in ``timestamps``."""
+    ordered = sorted(timestamps)
+    return array(TIMESTAMP_TYPE, ordered[bisect_right(ordered, 0):])
+
+
+def _cached(index, key, build):
+    with _sorted_columns_lock:
+        columns = _sorted_columns.setdefault(index, {})
+        column = columns.get(key)
+    if column is None:
+        column = build()
+        with _sorted_columns_lock:
+            columns[key] = column
+    return column
+
+
+def side_timestamps(index, side):
+    """Sorted known timestamps of one side of a category."""
+    return _cached(index, side, lambda: _known(index.timestamps.get(side, ())))
+
+
+def formation_timestamps(index):
+    """Sorted times at which each mutual became mutual: the later of the two follows.
+
+    Mutuals missing either timestamp are left out.
+    """
+    def build():
+        followers = index.timestamps.get("followers", ())
+        following = index.timestamps.get("following", ())
+        return _known(compress(map(max, followers, following), map(min, followers, following)))
+    return _cached(index, "formed", build)
+
+
+def _merge(*columns):
+    return array(TIMESTAMP_TYPE, sorted(chain(*columns)))
+
+
+def _floor(moment, granularity):
+    moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return moment - timedelta(days=moment.weekday())
+    if granularity == "month":
+        return moment.replace(day=1)
+    return moment
+
+
+def _next(moment, granularity):
+    if granularity == "week":
+        return moment + timedelta(weeks=1)
+    if granularity == "month":
+        return moment.replace(year=moment.year + moment.month // 12, month=moment.month % 12 + 1)
+    return moment + timedelta(days=1)
+
+
+def bin_edges(first, last, granularity):
+    """Return (labels, edges): UTC calendar bins covering first..last; edges has one more entry."""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    label_format = "%Y-%m" if granularity == "month" else "%Y-%m-%d"
+    moment = _floor(datetime.fromtimestamp(first, timezone.utc), granularity)
+    labels = []
+    edges = [int(moment.timestamp())]
+    while edges[-1] <= last:
+        labels.append(moment.strftime(label_format))
+        moment = _next(moment, granularity)
+        edges.append(int(moment.timestamp()))
+    return labels, edges
+
+
+def plausible_span(timestamps, now):
+    """(start, stop) positions of the sorted ``timestamps`` that fall in EARLIEST..now + 1 day."""
+    return bisect_left(timestamps, EARLIEST), bisect_right(timestamps, now + DAY)
+
+
+def histogram(timestamps, edges):
+    """Counts of sorted ``timestamps`` falling in each [edges[i], edges[i + 1]) bin."""
+    positions = list(map(partial(bisect_left, timestamps), edges))
+    return list(map(sub, positions[1:], positions))
+
+
+def celebrity_ages(index, now):
+    """How long ago the accounts that don't follow back were followed: bucket counts and the oldest few."""
+    timestamps = side_timestamps(index, "following")
+    start, end = plausible_span(timestamps, now)
+    newer = end
+    buckets = []
+    for days, label in CELEBRITY_AGES:
+        older = max(bisect_right(timestamps, now - days * DAY), start) if days is not None else start
+        buckets.append({"label": label, "count": newer - older})
+        newer = older
+
+    # The sorted column gives the cut-off date of the oldest few; one C-level pass then finds their rows
+    column = index.timestamps.get("following", ())
+    stop = min(start + OLDEST_CELEBRITIES, end)
+    rows = []
+    if stop > start:
+        cutoff = timestamps[stop - 1]
+        rows = _cached(index, ("oldest", cutoff), lambda: sorted(
+            compress(range(len(column)), map(range(EARLIEST, cutoff + 1).__contains__, column)),
+            key=column.__getitem__)[:stop - start])
+    oldest = [
+        {"username": index.names[row], "timestamp": column[row], "days_ago": (now - column[row]) // DAY}
+        for row in rows
+    ]
+    return {"buckets": buckets, "oldest": oldest, "unknown": len(index) - (end - start)}
+
+
+def timeline(result, granularity="week", now=None):
+    """Per-bin counts of new followers, new follows and mutuals formed, plus celebrity ages."""
+    if now is None:
+        now = int(datetime.now(timezone.utc).timestamp())
+    # Whole-side series span two categories; they are cached on the mutuals index, which lives as long as the result
+    followers = _cached(result["mutuals"], ("all", "followers"), lambda: _merge(
+        side_timestamps(result["not_followed_back"], "followers"), side_timestamps(result["mutuals"], "followers")))
+    following = _cached(result["mutuals"], ("all", "following"), lambda: _merge(
+        side_timestamps(result["not_following_back"], "following"), side_timestamps(result["mutuals"], "following")))
+    formed = formation_timestamps(result["mutuals"])
+
+    series = {"followers": followers, "following": following, "mutuals_formed": formed}
+    spans = {name: plausible_span(column, now) for name, column in series.items()}
+    known = [(series[name][start], series[name][stop - 1]) for name, (start, stop) in spans.items() if stop > start]
+    if known:
+        labels, edges = bin_edges(min(first for first, _ in known), max(last for _, last in known), granularity)
+    else:
+        labels, edges = [], [0]
+    return {
+        "granularity": granularity,
+        "labels": labels,
+        "series": {name: histogram(column, edges) for name, column in series.items()},
+        "totals": {name: stop - start for name, (start, stop) in spans.items()},
+        "celebrities": celebrity_ages(result["not_following_back"], now),
+    }
@@ -0,0 +1,187 @@
+"""Sorted username lists with cursor paging and prefix/substring search."""
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, count
+from operator import add
+
+SEARCH_MODES = ("prefix", "substring")
+
+# Timestamp columns are kept per side of the export, as array("q") with 0 for a missing timestamp
+SIDES = ("followers", "following")
+TIMESTAMP_TYPE = "q"
+TIMESTAMP_MIN = -(1 << 63)
+TIMESTAMP_MAX = (1 << 63) - 1
+
+
+def timestamp_value(timestamp):
+    """``timestamp`` as a column value: whole numbers that fit in int64 are kept, anything else is 0."""
+    if isinstance(timestamp, float) and timestamp.is_integer():
+        timestamp = int(timestamp)
+    if isinstance(timestamp, int) and TIMESTAMP_MIN <= timestamp <= TIMESTAMP_MAX:
+        return int(timestamp)
+    return 0
+
+
+def timestamp_column(timestamps, names):
+    """Column of ``timestamps[name]`` for each of ``names``, 0 where the export had none or an unusable one."""
+    try:
+        # Exports almost always carry in-range integer timestamps, which array() takes at C speed
+        return array(TIMESTAMP_TYPE, map(timestamps.__getitem__, names))
+    except (TypeError, OverflowError):
+        return array(TIMESTAMP_TYPE, map(timestamp_value, map(timestamps.__getitem__, names)))
+
+
+def partition_sorted(left, right):
+    """Split two sorted, duplicate-free lists into (left only, right only, both) in one merge.
+
+    The outputs come out sorted and share the input strings. The loop runs
+    over the shorter list and gallops through the longer one (exponential
+    probe, then bisect), so runs that only the longer side has are copied
+    with one slice instead of being stepped through.
+    """
+    swapped = len(left) > len(right)
+    short, long = (right, left) if swapped else (left, right)
+    short_only, long_only, both = [], [], []
+    size = len(long)
+    position = 0
+    for name in short:
+        lo = hi = position
+        step = 1
+        while hi < size and long[hi] < name:
+            lo = hi + 1
+            hi += step
+            step *= 2
+        found = bisect_left(long, name, lo, min(hi, size))
+        if found > position:
+            long_only += long[position:found]
+        if found < size and long[found] == name:
+            both.append(name)
+            position = found + 1
+        else:
+            short_only.append(name)
+            position = found
+    long_only += long[position:]
+    if swapped:
+        return long_only, short_only, both
+    return short_only, long_only, both
+
+
+class UsernameRows:
+    """Read-only sequence of the rows of a newline-joined blob, addressed through ``offsets``."""
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, item):
+        offsets = self._offsets
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if start >= stop:
+                return []
+            return self._blob[offsets[start]:offsets[stop] - 1].split("\n")
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("username row out of range")
+        return self._blob[offsets[item]:offsets[item + 1] - 1]
+
+
+class UsernameIndex:
+    """A sorted username list kept as one newline-joined blob plus row offsets.
+
+    A million usernames take a single string and an 8-byte offset per row
+    instead of a million string objects, which matters for results held in
+    the in-memory cache. Cursors are row positions in the sorted list, so a
+    cursor returned by a search can be passed back to continue that same
+    search. Prefix search is a bisect over the rows; substring search scans
+    the blob with ``str.find`` and maps hits back to rows through the offsets.
+
+    ``timestamps`` maps a side (see SIDES) to a column of follow timestamps
+    parallel to the rows; a category only has the sides it was found on.
+    """
+
+    def __init__(self, names, timestamps=None):
+        self._blob = "\n".join(names)
+        # Row i starts after the i preceding names and their newlines
+        self._offsets = array("q", map(add, accumulate(map(len, names), initial=0), count()))
+        self.names = UsernameRows(self._blob, self._offsets)
+        self.timestamps = timestamps or {}
+
+    @classmethod
+    def from_blob(cls, blob, timestamps=None):
+        return cls(blob.split("\n") if blob else [], timestamps)
+
+    @property
+    def blob(self):
+        return self._blob
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held: the blob's characters plus the offset and timestamp arrays."""
+        columns = [self._offsets, *self.timestamps.values()]
+        return len(self._blob) + sum(column.itemsize * len(column) for column in columns)
+
+    def __iter__(self):
+        return iter(self._blob.split("\n") if len(self) else ())
+
+    def _row_offsets(self):
+        return self._offsets
+
+    def iter_rows(self, batch_size=1000):
+        """Yield lists of (username, followers timestamp, following timestamp) rows.
+
+        Rows are produced ``batch_size`` at a time so callers can stream them;
+        a timestamp is None when the side is missing or had no timestamp.
+        """
+        columns = [self.timestamps.get(side) for side in SIDES]
+        for start in range(0, len(self), batch_size):
+            stop = min(start + batch_size, len(self))
+            values = [column[start:stop] if column is not None else [0] * (stop - start) for column in columns]
+            yield [(name, *(timestamp or None for timestamp in row))
+                   for name, *row in zip(self.names[start:stop], *values)]
+
+    def page(self, cursor=0, limit=100):
+        """Return (usernames, next_cursor); next_cursor is None on the last page."""
+        end = min(cursor + limit, len(self.names))
+        return self.names[cursor:end], (end if end < len(self.names) else None)
+
+    def search(self, query, mode="prefix", cursor=0, limit=100):
+        """Return (usernames, next_cursor) for the matches at or after cursor."""
+        if mode == "prefix":
+            return self._search_prefix(query, cursor, limit)
+        if mode == "substring":
+            return self._search_substring(query, cursor, limit)
+        raise ValueError(f"Unknown search mode: {mode}")
+
+    def _search_prefix(self, prefix, cursor, limit):
+        start = max(cursor, bisect_left(self.names, prefix))
+        stop = bisect_left(self.names, prefix + "\U0010ffff", lo=start)
+        end = min(start + limit, stop)
+        return self.names[start:end], (end if end < stop else None)
+
+    def _search_substring(self, query, cursor, limit):
+        blob = self.blob
+        offsets = self._row_offsets()
+        matches = []
+        if cursor >= len(self.names):
+            return matches, None
+        position = offsets[cursor]
+        while True:
+            hit = blob.find(query, position)
+            if hit < 0:
+                return matches, None
+            row = bisect_right(offsets, hit) - 1
+            if len(matches) == limit:
+                return matches, row
+            matches.append(self.names[row])
+            # Skip the rest of this row so a name is reported once
+            position = offsets[row + 1]
@@ -0,0 +1,125 @@
+"""Analyse a directory of Instagram exports without the GUI.
+
+Usage: python batch_analyze.py EXPORTS_DIR [--workers 4] [--output results.jsonl] [--counts-only]
+
+Every sub-folder and ``.zip`` file in EXPORTS_DIR is one account's export
+(the account is the folder or ZIP name). Exports are analysed in a process
+pool and each result is written as one JSON line as soon as it is ready, in
+completion order. A throughput summary goes to stderr at the end. Exits with
+status 1 if any export failed.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+
+from analysis import AnalysisError, diff_usernames
+from export_sources import ExportSource, read_followers, read_member_usernames
+
+CATEGORIES = ("not_following_back", "not_followed_back", "mutuals")
+
+
+def find_exports(directory):
+    """(account, path) for every export folder or ZIP directly inside ``directory``, by name."""
+    exports = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir():
+                exports.append((entry.name, entry.path))
+            elif entry.is_file() and entry.name.lower().endswith(".zip"):
+                exports.append((entry.name[:-4], entry.path))
+    return sorted(exports)
+
+
+def analyze_export(account, path, counts_only=False):
+    """Analyse one export in a pool worker; return its JSON Lines record."""
+    start = time.perf_counter()
+    totals = {"bytes": 0, "records": 0}
+
+    def progress(bytes_read, records):
+        totals["bytes"] += bytes_read
+        totals["records"] += records
+
+    record = {"account": account, "path": path}
+    try:
+        with ExportSource(path) as source:
+            if not source.followers or not source.following:
+                raise AnalysisError("Could not find followers_N.json and following.json.")
+            # This already runs in a pool worker, so parts are read in-process
+            followers = read_followers(source, progress, parallel=False)
+            following = read_member_usernames(source, source.following, progress)
+        result = diff_usernames(followers, following)
+    except Exception as e:
+        # One unreadable export (corrupt or encrypted ZIP, bad JSON, ...) must not end the batch
+        record["error"] = str(e) or type(e).__name__
+    else:
+        record["followers"] = len(followers)
+        record["following"] = len(following)
+        record["counts"] = {category: len(result[category]) for category in CATEGORIES}
+        if not counts_only:
+            record.update((category, list(result[category])) for category in CATEGORIES)
+    record.update(totals)
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def run_batch(exports, output, workers=None, counts_only=False):
+    """Fan ``exports`` out over a process pool, writing each record to ``output``; return a summary."""
+    start = time.perf_counter()
+    summary = {"exports": len(exports), "succeeded": 0, "failed": 0, "bytes": 0, "records": 0}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(analyze_export, account, path, counts_only): (account, path)
+                   for account, path in exports}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:
+                # The worker died or its record could not be sent back
+                account, path = futures[future]
+                record = {"account": account, "path": path, "error": str(e) or type(e).__name__,
+                          "bytes": 0, "records": 0}
+            summary["failed" if "error" in record else "succeeded"] += 1
+            summary["bytes"] += record["bytes"]
+            summary["records"] += record["records"]
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def format_summary(summary):
+    seconds = summary["seconds"] or float("inf")
+    return (f"{summary['succeeded']}/{summary['exports']} exports analysed ({summary['failed']} failed) "
+            f"in {summary['seconds']:.2f}s: {summary['exports'] / seconds:.1f} exports/s, "
+            f"{summary['bytes'] / seconds / 1e6:.1f} MB/s, {summary['records'] / seconds:,.0f} records/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", help="folder containing one export folder or ZIP per account")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--output", help="write JSON Lines here instead of stdout")
+    parser.add_argument("--counts-only", action="store_true", help="leave the username lists out of each record")
+    args = parser.parse_args(argv)
+
+    exports = find_exports(args.directory)
+    if not exports:
+        print(f"No export folders or ZIPs in {args.directory}", file=sys.stderr)
+        return 1
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            summary = run_batch(exports, output, args.workers, args.counts_only)
+    else:
+        summary = run_batch(exports, sys.stdout, args.workers, args.counts_only)
+    print(format_summary(summary), file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Compare the set-based diff with the sorted-merge partition at large scales.
+
+Usage: python benchmarks/bench_diff.py [--cases 1000000:5000 1000000:1000000] [--repeat 3]
+
+Each case is FOLLOWERS:FOLLOWING with --overlap of the smaller side mutual.
+``sets`` is the previous diff: three set operations, three sorts, and the
+newline join the result store needed; its result is the sorted lists.
+``merge`` is analysis.diff_usernames: two sorts, one partition_sorted merge,
+the follow timestamp columns and the blob-backed UsernameIndex. Reported per
+path: best wall time, tracemalloc peak above the parsed inputs, and what the
+result still holds once the inputs are freed.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analysis import diff_usernames
+from generate_export import plan_indices, username
+
+DEFAULT_CASES = ["1000000:5000", "1000000:1000000"]
+
+
+def build_inputs(followers, following, overlap):
+    """{username: timestamp} maps shaped like the parser's output."""
+    follower_ids, following_ids, _ = plan_indices(followers, following, overlap)
+    followers_map = {username(i): 1_700_000_000 - i for i in follower_ids}
+    following_map = {username(i): 1_700_000_000 - i for ids in following_ids for i in ids}
+    return followers_map, following_map
+
+
+def set_diff(followers, following):
+    followers, following = followers.keys(), following.keys()
+    categories = [sorted(following - followers), sorted(followers - following), sorted(followers & following)]
+    for names in categories:
+        "\n".join(names)
+    return categories
+
+
+def merge_diff(followers, following):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return diff_usernames(followers, following)
+
+
+def measure(func, case, repeat):
+    followers, following = build_inputs(*case)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(followers, following)
+        best = min(best, time.perf_counter() - start)
+        del result
+        gc.collect()
+
+    # Memory: build the inputs under tracemalloc so freeing them shows what the result keeps alive
+    del followers, following
+    gc.collect()
+    tracemalloc.start()
+    try:
+        followers, following = build_inputs(*case)
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = func(followers, following)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        del followers, following
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return best, peak, retained
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="+", default=DEFAULT_CASES, help="FOLLOWERS:FOLLOWING pairs")
+    parser.add_argument("--overlap", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'followers':>10} {'following':>10} {'path':<6} {'time':>10} {'peak':>11} {'retained':>11}")
+    for spec in args.cases:
+        followers, following = (int(part) for part in spec.split(":"))
+        case = (followers, following, args.overlap)
+        for name, func in (("sets", set_diff), ("merge", merge_diff)):
+            seconds, peak, retained = measure(func, case, args.repeat)
+            print(f"{followers:>10} {following:>10} {name:<6} {seconds * 1000:8.0f} ms "
+                  f"{peak / 1e6:8.1f} MB {retained / 1e6:8.1f} MB", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Compare the streaming export parser against the old json.load path.
+
+Usage: python benchmarks/bench_parser.py [export.json ...] [--repeat N]
+
+For each file, reports parse throughput (MB/s) and tracemalloc peak memory
+for a full ``json.load`` + tree walk versus ``UsernameStream``.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from export_parser import UsernameStream, record_usernames
+
+DEFAULT_FILES = [
+    os.path.join(ROOT, "uploads", "followers_1.json"),
+    os.path.join(ROOT, "uploads", "following.json"),
+]
+
+
+def load_with_json(path):
+    """The pre-streaming path: load the whole tree, then walk it"""
+    with open(path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        data = next((v for k, v in data.items() if k.startswith("relationships_")), [])
+    usernames = set()
+    for record in data:
+        for value, _ in record_usernames(record):
+            usernames.add(value.lower().strip())
+    return usernames
+
+
+def load_with_stream(path):
+    with open(path, "rb") as file:
+        return {value.lower().strip() for value, _ in UsernameStream(file)}
+
+
+def measure(func, path, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(path)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", default=DEFAULT_FILES)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    for path in args.files:
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"{os.path.basename(path)} ({size_mb:.2f} MB)")
+        baseline = None
+        for name, func in (("json.load", load_with_json), ("stream", load_with_stream)):
+            usernames, seconds, peak = measure(func, path, args.repeat)
+            if baseline is None:
+                baseline = usernames
+            elif usernames != baseline:
+                print(f"  !! {name} produced a different username set")
+            print(f"  {name:<10} {size_mb / seconds:8.1f} MB/s  peak {peak / 1e6:8.2f} MB  "
+                  f"{len(usernames)} usernames")
+
+
+if __name__ == "__main__":
+    main()
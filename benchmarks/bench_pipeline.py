@@ -0,0 +1,212 @@
+"""Time each stage of the analysis pipeline on synthetic exports.
+
+Usage: python benchmarks/bench_pipeline.py [--scales 1000 100000 1000000] [--output results.json]
+                                           [--compare previous.json]
+
+For every scale (number of followers; following is --following-ratio of it)
+an export is generated with generate_export.py and these stages are timed:
+load (json.load of every file), extract_usernames (walking those trees),
+stream_parse (the streaming reader the app uses), set_algebra, sort, render
+(index.html) and index_post (a full ZIP upload through the Flask test
+client). Each stage reports its best wall time over --repeat runs and its
+tracemalloc peak from one extra run. Peak memory of index_post does not cover
+pool worker processes.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_export import generate
+from export_parser import normalize_username, record_usernames
+from export_sources import ExportSource, read_followers, read_member_usernames
+
+DEFAULT_SCALES = [1_000, 10_000, 100_000]
+
+
+def measure(func, repeat):
+    """Best wall time over ``repeat`` runs, then tracemalloc peak of one more run."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def load_trees(folder):
+    """The pre-streaming path: json.load every followers part and following.json"""
+    with ExportSource(folder) as source:
+        trees = []
+        for member in source.followers + [source.following]:
+            with source.open(member) as file:
+                trees.append(json.load(file))
+    return trees[:-1], trees[-1]
+
+
+def extract_from_trees(followers_trees, following_tree):
+    def walk(records):
+        return {normalize_username(value): timestamp
+                for record in records for value, timestamp in record_usernames(record)}
+
+    followers = {}
+    for tree in followers_trees:
+        followers.update(walk(tree))
+    return followers, walk(following_tree["relationships_following"])
+
+
+def stream_parse(folder):
+    with ExportSource(folder) as source:
+        return read_followers(source), read_member_usernames(source, source.following)
+
+
+def set_algebra(followers, following):
+    followers, following = followers.keys(), following.keys()
+    return following - followers, followers - following, followers & following
+
+
+def sort_results(categories):
+    return [sorted(category) for category in categories]
+
+
+def zip_variants(zip_path):
+    """Yield copies of the export ZIP with a changing archive comment, so uploads never hit the result cache."""
+    with open(zip_path, "rb") as file:
+        original = file.read()
+    run = 0
+    while True:
+        buffer = io.BytesIO(original)
+        with zipfile.ZipFile(buffer, "a") as archive:
+            archive.comment = f"bench run {run} {time.time()}".encode()
+        run += 1
+        yield buffer.getvalue()
+
+
+def bench_scale(scale, args, workdir):
+    import app as app_module
+    from analysis import diff_usernames
+
+    following_count = max(1, int(scale * args.following_ratio))
+    folder = os.path.join(workdir, f"export_{scale}")
+    zip_path = folder + ".zip"
+    generate(folder, scale, following_count, args.overlap)
+    generate(zip_path, scale, following_count, args.overlap, as_zip=True)
+
+    followers_trees, following_tree = load_trees(folder)
+    followers, following = extract_from_trees(followers_trees, following_tree)
+    categories = set_algebra(followers, following)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = diff_usernames(followers, following)
+    variants = zip_variants(zip_path)
+    client = app_module.app.test_client()
+
+    def render():
+        with app_module.app.test_request_context("/"):
+            app_module.render_template("index.html", result=result, result_id="bench", changes=None)
+
+    render()  # compile the template outside the timed runs
+
+    def index_post():
+        payload = next(variants)
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = client.post("/", data={"export_zip": (io.BytesIO(payload), "export.zip")},
+                                   content_type="multipart/form-data")
+        assert response.status_code == 200, response.status_code
+
+    stages = [
+        ("load", lambda: load_trees(folder)),
+        ("extract_usernames", lambda: extract_from_trees(followers_trees, following_tree)),
+        ("stream_parse", lambda: stream_parse(folder)),
+        ("set_algebra", lambda: set_algebra(followers, following)),
+        ("sort", lambda: sort_results(categories)),
+        ("render", render),
+        ("index_post", index_post),
+    ]
+    size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(folder) for f in files)
+    rows = []
+    for stage, func in stages:
+        if args.stages and stage not in args.stages:
+            continue
+        seconds, peak = measure(func, args.repeat)
+        rows.append({"scale": scale, "stage": stage, "seconds": seconds, "peak_bytes": peak, "input_bytes": size})
+        print(f"{scale:>9} {stage:<18} {seconds * 1000:10.1f} ms  peak {peak / 1e6:9.1f} MB", flush=True)
+    return rows
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(rows, baseline_path):
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {(row["scale"], row["stage"]): row for row in json.load(file)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for row in rows:
+        before = baseline.get((row["scale"], row["stage"]))
+        if before:
+            time_ratio = row["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+            memory_ratio = row["peak_bytes"] / before["peak_bytes"] if before["peak_bytes"] else float("inf")
+            print(f"{row['scale']:>9} {row['stage']:<18} time x{time_ratio:5.2f}  peak x{memory_ratio:5.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--following-ratio", type=float, default=0.5)
+    parser.add_argument("--overlap", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stages", nargs="+", help="only run these stages")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare against")
+    args = parser.parse_args(argv)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scales:
+            rows.extend(bench_scale(scale, args, workdir))
+
+    report = {
+        "meta": {
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "created": time.time(),
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "args": vars(args),
+        },
+        "results": rows,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved {args.output}")
+    if args.compare:
+        compare(rows, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Generate synthetic Instagram follower/following exports for benchmarking.
+
+Usage: python benchmarks/generate_export.py OUT --followers 100000 --following 5000 [--overlap 0.6] [--zip]
+
+Writes ``connections/followers_and_following/followers_N.json`` parts and
+``following.json`` in the same schema as a real export (see
+``uploads/followers_1.json``). Records are written one at a time, so even
+5M-account exports are generated in constant memory.
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import random
+import time
+import zipfile
+
+EXPORT_DIR = "connections/followers_and_following"
+DEFAULT_PART_SIZE = 50_000
+
+WORDS = [
+    "sunny", "the", "real", "its", "official", "daily", "art", "photo", "travel", "coffee",
+    "lena", "sam", "alex", "mia", "jay", "noah", "zoe", "leo", "ava", "kai", "nina", "theo",
+    "studio", "vibes", "eats", "film", "club", "paris", "tokyo", "toronto", "moon", "blue",
+]
+SEPARATORS = ["", ".", "_", "__", "."]
+
+FOLLOWER_RECORD = """  {{
+    "title": "",
+    "media_list_data": [
+
+    ],
+    "string_list_data": [
+      {{
+        "href": "https://www.instagram.com/{name}",
+        "value": "{name}",
+        "timestamp": {timestamp}
+      }}
+    ]
+  }}"""
+
+FOLLOWING_RECORD = """    {{
+      "title": "{name}",
+      "string_list_data": [
+        {{
+          "href": "https://www.instagram.com/_u/{name}",
+          "timestamp": {timestamp}
+        }}
+      ]
+    }}"""
+
+
+def username(index, seed=0):
+    """Deterministic, realistic-looking username that is unique per index.
+
+    Words never contain digits, so the trailing digits (the index) keep names unique.
+    """
+    rng = random.Random(index * 7919 + seed)
+    parts = [rng.choice(WORDS)]
+    if rng.random() < 0.5:
+        parts.append(rng.choice(SEPARATORS) + rng.choice(WORDS))
+    return "".join(parts) + rng.choice(SEPARATORS) + str(index)
+
+
+def permutation(count, seed=0):
+    """Yield 0..count-1 in a scrambled order without materialising a list."""
+    if count <= 1:
+        yield from range(count)
+        return
+    rng = random.Random(seed)
+    step = rng.randrange(1, count)
+    while math.gcd(step, count) != 1:
+        step = rng.randrange(1, count)
+    offset = rng.randrange(count)
+    for i in range(count):
+        yield (offset + i * step) % count
+
+
+def timestamps(count, seed=0, now=None):
+    """Newest-first follow timestamps spread over the last few years."""
+    rng = random.Random(seed)
+    current = int(now or time.time())
+    mean_gap = max(1, 4 * 365 * 86400 // max(count, 1))
+    for _ in range(count):
+        yield current
+        current -= rng.randint(1, 2 * mean_gap)
+
+
+def plan_indices(followers, following, overlap):
+    """Username indices for each side; ``overlap`` is the mutual share of the smaller side."""
+    mutuals = int(min(followers, following) * overlap)
+    follower_ids = range(0, followers)
+    following_ids = [range(0, mutuals), range(followers, followers + following - mutuals)]
+    return follower_ids, following_ids, mutuals
+
+
+def write_records(file, template, names, stamps, opening, closing):
+    file.write(opening)
+    for i, (name, timestamp) in enumerate(zip(names, stamps)):
+        if i:
+            file.write(",\n")
+        file.write(template.format(name=name, timestamp=timestamp))
+    file.write(closing)
+
+
+@contextlib.contextmanager
+def open_output(out, member, archive):
+    if archive is not None:
+        with archive.open(f"{EXPORT_DIR}/{member}", "w") as raw, \
+                io.TextIOWrapper(raw, encoding="utf-8") as file:
+            yield file
+    else:
+        path = os.path.join(out, EXPORT_DIR, member)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            yield file
+
+
+def generate(out, followers, following, overlap=0.5, part_size=DEFAULT_PART_SIZE, as_zip=False, seed=0):
+    """Write an export to ``out`` (a folder, or a .zip path with as_zip); return its stats."""
+    follower_ids, following_ids, mutuals = plan_indices(followers, following, overlap)
+    archive = zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) if as_zip else None
+    try:
+        order = permutation(followers, seed)
+        stamps = timestamps(followers, seed)
+        parts = max(1, math.ceil(followers / part_size))
+        for part in range(parts):
+            count = min(part_size, followers - part * part_size)
+            names = (username(follower_ids[next(order)], seed) for _ in range(count))
+            with open_output(out, f"followers_{part + 1}.json", archive) as file:
+                write_records(file, FOLLOWER_RECORD, names, stamps, "[\n", "\n]")
+
+        following_count = sum(len(ids) for ids in following_ids)
+        order = permutation(following_count, seed + 1)
+        mutual_count = len(following_ids[0])
+
+        def following_name(position):
+            if position < mutual_count:
+                return username(following_ids[0][position], seed)
+            return username(following_ids[1][position - mutual_count], seed)
+
+        names = (following_name(position) for position in order)
+        with open_output(out, "following.json", archive) as file:
+            write_records(file, FOLLOWING_RECORD, names, timestamps(following_count, seed + 1),
+                          '{\n  "relationships_following": [\n', "\n  ]\n}")
+    finally:
+        if archive is not None:
+            archive.close()
+    return {"followers": followers, "following": following, "mutuals": mutuals, "followers_parts": parts}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out", help="output folder, or .zip path with --zip")
+    parser.add_argument("--followers", type=int, default=10_000)
+    parser.add_argument("--following", type=int, default=1_000)
+    parser.add_argument("--overlap", type=float, default=0.5,
+                        help="share of the smaller side that is mutual (0-1)")
+    parser.add_argument("--part-size", type=int, default=DEFAULT_PART_SIZE,
+                        help="followers per followers_N.json part")
+    parser.add_argument("--zip", action="store_true", help="write a ZIP archive instead of a folder")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    stats = generate(args.out, args.followers, args.following, args.overlap, args.part_size, args.zip, args.seed)
+    print(f"Wrote {args.out}: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Concurrent upload load test for the web app.
+
+Usage: python benchmarks/load_test.py [--workers 1 2 4] [--requests 200] [--concurrency 16]
+       python benchmarks/load_test.py --url http://127.0.0.1:8000/
+
+Starts gunicorn with each worker count in turn (or targets an already running
+server with --url), fires concurrent uploads where every request carries its
+own distinct followers/following pair, and checks each response (and the
+results API pages behind it) only contains that request's usernames and the
+expected counts.
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+from urllib.request import Request, urlopen
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, "app")
+GUNICORN_CONFIG = os.path.join(ROOT, "gunicorn.conf.py")
+
+COUNTS = re.compile(rb"\((\d+)\)\s*</button>")
+RESULT_ID = re.compile(rb'data-result-id="(\w+)"')
+REQUEST_TAG = re.compile(r"req(\d+)x")
+CATEGORIES = ("not_following_back", "not_followed_back", "mutuals")
+
+
+def make_exports(request_id, size):
+    """Build a followers/following pair whose usernames are unique to request_id"""
+    followers_count = size + request_id % 17
+    following_count = size + request_id % 11
+    overlap = min(followers_count, following_count) // 2 + request_id % 7
+    followers = [f"req{request_id}x_f{i}" for i in range(followers_count)]
+    following = followers[:overlap] + [f"req{request_id}x_g{i}" for i in range(following_count - overlap)]
+
+    followers_json = [
+        {"title": "", "media_list_data": [], "string_list_data": [
+            {"href": f"https://www.instagram.com/{name}", "value": name, "timestamp": 1700000000 + i}]}
+        for i, name in enumerate(followers)
+    ]
+    following_json = {"relationships_following": [
+        {"title": name, "string_list_data": [
+            {"href": f"https://www.instagram.com/_u/{name}", "timestamp": 1700000000 + i}]}
+        for i, name in enumerate(following)
+    ]}
+    expected = (len(following) - overlap, len(followers) - overlap, overlap)
+    return json.dumps(followers_json).encode(), json.dumps(following_json).encode(), expected
+
+
+def encode_multipart(files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for field, (filename, payload) in files.items():
+        parts.append(
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            "Content-Type: application/json\r\n\r\n".encode() + payload + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def build_request(request_id, size):
+    followers, following, expected = make_exports(request_id, size)
+    body, content_type = encode_multipart({
+        "followers_file": ("followers_1.json", followers),
+        "following_file": ("following.json", following),
+    })
+    return request_id, body, content_type, expected
+
+
+def run_one(url, request_id, body, content_type, expected):
+    request = Request(url, data=body, headers={"Content-Type": content_type})
+    with urlopen(request, timeout=120) as response:
+        html = response.read()
+
+    counts = tuple(int(n) for n in COUNTS.findall(html)[:3])
+    tags = set()
+    result_id = RESULT_ID.search(html)
+    if result_id:
+        # Usernames are served by the results API, possibly from another worker
+        for category in CATEGORIES:
+            page_url = urljoin(url, f"/api/results/{result_id.group(1).decode()}/{category}?limit=500")
+            with urlopen(page_url, timeout=120) as response:
+                usernames = json.load(response)["usernames"]
+            tags.update(int(n) for n in REQUEST_TAG.findall(" ".join(usernames)))
+    if counts != expected or tags != {request_id}:
+        return f"request {request_id}: expected {expected}, got {counts} (usernames from {sorted(tags)})"
+    return None
+
+
+def run_load(url, payloads, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        errors = [e for e in pool.map(lambda p: run_one(url, *p), payloads) if e]
+    elapsed = time.perf_counter() - start
+    return len(payloads) / elapsed, errors
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(workers):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", GUNICORN_CONFIG, "--chdir", APP_DIR, "-w", str(workers),
+         "-b", f"127.0.0.1:{port}", "--log-level", "warning", "app:app"],
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process, f"http://127.0.0.1:{port}/"
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("gunicorn did not start")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="target an already running server instead of starting gunicorn")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--size", type=int, default=2000, help="approximate accounts per export")
+    args = parser.parse_args(argv)
+
+    payloads = [build_request(i, args.size) for i in range(args.requests)]
+    targets = [(None, args.url)] if args.url else [(w, None) for w in args.workers]
+    failed = False
+    for workers, url in targets:
+        process = None
+        if url is None:
+            process, url = start_gunicorn(workers)
+        try:
+            throughput, errors = run_load(url, payloads, args.concurrency)
+        finally:
+            if process:
+                process.terminate()
+                process.wait()
+        label = f"{workers} worker(s)" if workers else url
+        print(f"{label:<14} {throughput:8.1f} req/s  {len(errors)} mismatched responses")
+        for error in errors[:5]:
+            print(f"  {error}")
+        failed = failed or bool(errors)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
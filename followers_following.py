@@ -1,120 +1,141 @@
-import json
+import heapq
 import os
+import queue
+import sys
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext, ttk
 
-def load_json_from_path(file_path):
-    if not os.path.exists(file_path):
-        messagebox.showerror("Error", f"File not found: {file_path}")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+
+from export_parser import UsernameStream, collect_usernames
+from export_sources import ExportSource, folder_manifest, read_followers
+
+PREVIEW_SIZE = 50
+POLL_INTERVAL_MS = 100
+
+def parse_member(source, member, label, events):
+    """Stream one file's usernames, reporting progress to the UI thread through events"""
+    def progress(bytes_read, records):
+        events.put(("progress", label, bytes_read, records))
+
+    with source.open(member) as file:
+        stream = UsernameStream(file, progress=progress)
+        usernames = collect_usernames(stream)
+    print(f"Extracted {len(usernames)} usernames from {source.display_name(member)}")
+    return usernames, {"root_key": stream.root_key, "sample": stream.sample, "records": stream.records}
+
+def export_stamp(location):
+    """Path, mtime and size of every file a parse of location reads; None if they can't be listed"""
+    try:
+        if os.path.isdir(location):
+            paths = [os.path.join(location, name) for name in folder_manifest(location)]
+        else:
+            paths = [location]
+        return tuple((path, stat.st_mtime_ns, stat.st_size) for path, stat in zip(paths, map(os.stat, paths)))
+    except OSError:
         return None
+
+def parse_export(location, stamp, events):
+    """Worker thread: read every file of the export once, then queue the finished analysis"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
+        with ExportSource(location) as source:
+            if not source.followers:
+                events.put(("error", "Could not find followers file. Look for followers_1.json, followers_2.json, ... in the export."))
+                return
+            if not source.following:
+                events.put(("error", "Could not find following file. Look for following.json in the export."))
+                return
+            
+            print(f"\nUsing files:")
+            print(f"Followers: {', '.join(source.followers)}")
+            print(f"Following: {source.following}")
+            
+            structures = {}
+            # The structure sample comes from the first part; any others go through the process pool
+            followers_usernames, structures["followers"] = parse_member(source, source.followers[0], "followers", events)
+            followers_usernames |= read_followers(
+                source, lambda bytes_read, records: events.put(("progress", "followers", bytes_read, records)),
+                members=source.followers[1:])
+            following_usernames, structures["following"] = parse_member(source, source.following, "following", events)
+            files = ([source.display_name(m) for m in source.followers], source.display_name(source.following))
+        report = build_report(files, followers_usernames, following_usernames)
     except Exception as e:
-        messagebox.showerror("Error", f"Failed to load {file_path}: {str(e)}")
-        return None
+        events.put(("error", f"Failed to load {location}: {str(e)}"))
+        return
+    events.put(("done", {"location": location, "stamp": stamp, "structures": structures, "report": report}))
 
-def extract_followers_usernames(json_data):
-    """Extract usernames from followers_1.json"""
-    usernames = set()
-    
-    if not json_data:
-        return usernames
-    
-    print(f"\n=== FOLLOWERS DATA STRUCTURE ===")
-    print(f"Type: {type(json_data)}")
-    if isinstance(json_data, list):
-        print(f"List length: {len(json_data)}")
-        if json_data:
-            print(f"First item keys: {list(json_data[0].keys())}")
-    
-    # New Instagram format for followers_1.json
-    if isinstance(json_data, list):
-        for item in json_data:
-            if isinstance(item, dict):
-                # Look for string_list_data
-                if "string_list_data" in item and isinstance(item["string_list_data"], list):
-                    for string_item in item["string_list_data"]:
-                        if isinstance(string_item, dict) and "value" in string_item:
-                            usernames.add(string_item["value"])
-                            print(f"Added follower: {string_item['value']}")
-    
-    print(f"Extracted {len(usernames)} usernames from followers")
-    return usernames
+def format_section(lines, title, usernames, empty_message):
+    lines.append(f"{title} ({len(usernames)}):")
+    lines.append(f"{'─'*60}")
+    if usernames:
+        # Only the preview is shown, so there is no need to sort the whole category
+        for i, username in enumerate(heapq.nsmallest(PREVIEW_SIZE, usernames), 1):
+            lines.append(f"{i:3}. @{username}")
+        if len(usernames) > PREVIEW_SIZE:
+            lines.append(f"\n... and {len(usernames) - PREVIEW_SIZE} more")
+    else:
+        lines.append(empty_message)
 
-def extract_following_usernames(json_data):
-    """Extract usernames from following.json"""
-    usernames = set()
-    
-    if not json_data:
-        return usernames
-    
-    print(f"\n=== FOLLOWING DATA STRUCTURE ===")
-    print(f"Type: {type(json_data)}")
-    if isinstance(json_data, dict):
-        print(f"Keys: {list(json_data.keys())}")
-    
-    # New Instagram format for following.json
-    if isinstance(json_data, dict):
-        # Check for relationships_following key
-        if "relationships_following" in json_data and isinstance(json_data["relationships_following"], list):
-            for item in json_data["relationships_following"]:
-                if isinstance(item, dict):
-                    # Username is in the "title" field for following.json
-                    if "title" in item and item["title"]:
-                        usernames.add(item["title"])
-                        print(f"Added following: {item['title']}")
-        
-        # Alternative structure check
-        elif "following" in json_data and isinstance(json_data["following"], list):
-            for item in json_data["following"]:
-                if isinstance(item, dict) and "title" in item:
-                    usernames.add(item["title"])
-                    print(f"Added following (alternative): {item['title']}")
+def build_report(files, followers_usernames, following_usernames):
+    """The whole results text, built off the UI thread so it can be shown in one insert"""
+    print(f"\nFinal counts:")
+    print(f"Followers found: {len(followers_usernames)}")
+    print(f"Following found: {len(following_usernames)}")
     
-    print(f"Extracted {len(usernames)} usernames from following")
-    return usernames
+    not_following_back = following_usernames.keys() - followers_usernames.keys()
+    not_followed_back = followers_usernames.keys() - following_usernames.keys()
+    mutuals = followers_usernames.keys() & following_usernames.keys()
+    followers_files, following_file = files
+    
+    lines = [
+        f"📊 INSTAGRAM FOLLOWERS ANALYSIS",
+        f"{'='*60}\n",
+        f"🔍 FILES LOADED:",
+        f"• Followers: {', '.join(followers_files)}",
+        f"• Following: {following_file}\n",
+        f"📈 SUMMARY STATISTICS:",
+        f"• Your followers: {len(followers_usernames)}",
+        f"• You follow: {len(following_usernames)}",
+        f"• Mutual followers: {len(mutuals)}",
+        f"• Not following you back: {len(not_following_back)}",
+        f"• You don't follow back: {len(not_followed_back)}\n",
+        f"{'='*60}\n",
+    ]
+    format_section(lines, "1️⃣ PEOPLE YOU FOLLOW WHO DON'T FOLLOW BACK", not_following_back,
+                   "🎉 No one! Everyone you follow follows you back.")
+    lines.append(f"\n{'='*60}\n")
+    format_section(lines, "2️⃣ PEOPLE WHO FOLLOW YOU BUT YOU DON'T FOLLOW BACK", not_followed_back,
+                   "✅ You follow back all your followers!")
+    lines.append(f"\n{'='*60}\n")
+    format_section(lines, "3️⃣ MUTUAL FOLLOWERS", mutuals, "No mutual followers found.")
+    lines.append(f"\n{'='*60}")
+    lines.append(f"✅ Analysis completed successfully!")
+    lines.append(f"Generated: {len(following_usernames) - len(mutuals)} unfollow suggestions")
+    return "\n".join(lines) + "\n"
 
 def select_base_folder():
     folder_selected = filedialog.askdirectory(title="Select Base Folder")
     if folder_selected:
-        global base_folder
+        global base_folder, analysis
         base_folder = folder_selected
+        analysis = None
         folder_label.config(text=f"📁 {base_folder}")
     else:
         messagebox.showerror("Error", "No folder selected.")
 
-def analyze_structure():
-    """Debug function to analyze JSON structure"""
-    if not base_folder:
-        messagebox.showerror("Error", "Please select a base folder first.")
-        return
-    
-    followers_file = os.path.join(base_folder, "followers_1.json")
-    following_file = os.path.join(base_folder, "following.json")
-    
-    if not os.path.exists(followers_file):
-        followers_file = find_file(base_folder, "followers")
-    
-    if not os.path.exists(following_file):
-        following_file = find_file(base_folder, "following")
-    
-    if not followers_file or not following_file:
-        messagebox.showerror("Error", "Could not find follower/following files.")
-        return
-    
-    # Analyze followers file
-    followers_data = load_json_from_path(followers_file)
-    if followers_data:
-        analyze_file_structure(followers_data, "followers")
-    
-    # Analyze following file
-    following_data = load_json_from_path(following_file)
-    if following_data:
-        analyze_file_structure(following_data, "following")
+def select_export_zip():
+    zip_selected = filedialog.askopenfilename(title="Select Instagram Export ZIP", filetypes=[("ZIP archives", "*.zip")])
+    if zip_selected:
+        global base_folder, analysis
+        base_folder = zip_selected
+        analysis = None
+        folder_label.config(text=f"📦 {base_folder}")
+    else:
+        messagebox.showerror("Error", "No ZIP selected.")
 
-def analyze_file_structure(data, file_type):
-    """Print detailed structure analysis"""
+def analyze_file_structure(structure, file_type):
+    """Print detailed structure analysis from the first record seen while parsing"""
     print(f"\n{'='*50}")
     print(f"ANALYZING {file_type.upper()} STRUCTURE")
     print(f"{'='*50}")
@@ -138,172 +159,142 @@ def analyze_file_structure(data, file_type):
                 if isinstance(obj[0], (dict, list)):
                     print_structure(obj[0], indent + 1, max_depth, current_depth + 1)
     
-    print_structure(data)
+    indent = 0
+    if structure["root_key"]:
+        print(f"{structure['root_key']}: list")
+        indent = 1
+    print("  " * indent + f"List with {structure['records']} items")
+    if structure["sample"] is not None:
+        print_structure(structure["sample"], indent + 1)
 
-def find_file(base_folder, pattern):
-    """Find a file containing the pattern in its name"""
-    for root, dirs, files in os.walk(base_folder):
-        for file in files:
-            if pattern in file.lower() and file.endswith('.json'):
-                return os.path.join(root, file)
-    return None
+def set_busy(busy):
+    for button in (folder_button, zip_button, debug_button, process_button):
+        button.state(["disabled"] if busy else ["!disabled"])
+    status_label.config(text="⏳ Reading export..." if busy else "")
 
-def process_files():
+def show_analysis(show_results):
+    for file_type, structure in analysis["structures"].items():
+        analyze_file_structure(structure, file_type)
+    if show_results:
+        output_text.configure(state="normal")
+        output_text.delete('1.0', tk.END)
+        output_text.insert(tk.END, analysis["report"])
+        output_text.configure(state="disabled")
+
+def poll_events(events, show_results, totals):
+    """Drain the worker's queue on the Tk thread, then check again shortly"""
+    global analysis
+    while True:
+        try:
+            event = events.get_nowait()
+        except queue.Empty:
+            break
+        if event[0] == "progress":
+            _, label, bytes_read, records = event
+            totals[label][0] += bytes_read
+            totals[label][1] += records
+        elif event[0] == "error":
+            set_busy(False)
+            messagebox.showerror("Error", event[1])
+            return
+        else:
+            analysis = event[1]
+            set_busy(False)
+            show_analysis(show_results)
+            return
+    status_label.config(text="⏳ " + "   ".join(
+        f"{label}: {bytes_read / 1e6:.1f} MB, {records:,} records"
+        for label, (bytes_read, records) in totals.items() if bytes_read))
+    root.after(POLL_INTERVAL_MS, poll_events, events, show_results, totals)
+
+def start_analysis(show_results):
+    """Parse the selected export in a worker thread, or reuse the last parse if its files haven't changed"""
     if not base_folder:
         messagebox.showerror("Error", "Please select a base folder first.")
         return
     
-    # First, try to analyze structure for debugging
-    analyze_structure()
-    
-    # Try to find files with various names and locations
-    followers_file = find_file(base_folder, "followers")
-    following_file = find_file(base_folder, "following")
-    
-    if not followers_file:
-        messagebox.showerror("Error", "Could not find followers file. Look for any JSON file containing 'followers' in the name.")
-        return
-    
-    if not following_file:
-        messagebox.showerror("Error", "Could not find following file. Look for any JSON file containing 'following' in the name.")
-        return
-    
-    print(f"\nUsing files:")
-    print(f"Followers: {followers_file}")
-    print(f"Following: {following_file}")
-    
-    followers_data = load_json_from_path(followers_file)
-    following_data = load_json_from_path(following_file)
-    
-    if not followers_data or not following_data:
+    stamp = export_stamp(base_folder)
+    if (analysis is not None and analysis["location"] == base_folder
+            and stamp is not None and analysis["stamp"] == stamp):
+        show_analysis(show_results)
         return
     
-    followers_usernames = extract_followers_usernames(followers_data)
-    following_usernames = extract_following_usernames(following_data)
-    
-    print(f"\nFinal counts:")
-    print(f"Followers found: {len(followers_usernames)}")
-    print(f"Following found: {len(following_usernames)}")
-    
-    not_following_back = following_usernames - followers_usernames
-    not_followed_back = followers_usernames - following_usernames
-    mutuals = followers_usernames & following_usernames
-    
-    output_text.configure(state="normal")
-    output_text.delete('1.0', tk.END)
-    
-    # Display results
-    output_text.insert(tk.END, f"📊 INSTAGRAM FOLLOWERS ANALYSIS\n")
-    output_text.insert(tk.END, f"{'='*60}\n\n")
-    
-    output_text.insert(tk.END, f"🔍 FILES LOADED:\n")
-    output_text.insert(tk.END, f"• Followers: {os.path.basename(followers_file)}\n")
-    output_text.insert(tk.END, f"• Following: {os.path.basename(following_file)}\n\n")
-    
-    output_text.insert(tk.END, f"📈 SUMMARY STATISTICS:\n")
-    output_text.insert(tk.END, f"• Your followers: {len(followers_usernames)}\n")
-    output_text.insert(tk.END, f"• You follow: {len(following_usernames)}\n")
-    output_text.insert(tk.END, f"• Mutual followers: {len(mutuals)}\n")
-    output_text.insert(tk.END, f"• Not following you back: {len(not_following_back)}\n")
-    output_text.insert(tk.END, f"• You don't follow back: {len(not_followed_back)}\n\n")
-    
-    output_text.insert(tk.END, f"{'='*60}\n\n")
-    
-    output_text.insert(tk.END, f"1️⃣ PEOPLE YOU FOLLOW WHO DON'T FOLLOW BACK ({len(not_following_back)}):\n")
-    output_text.insert(tk.END, f"{'─'*60}\n")
-    if not_following_back:
-        sorted_list = sorted(not_following_back)
-        for i, username in enumerate(sorted_list[:50], 1):
-            output_text.insert(tk.END, f"{i:3}. @{username}\n")
-        if len(not_following_back) > 50:
-            output_text.insert(tk.END, f"\n... and {len(not_following_back) - 50} more\n")
-    else:
-        output_text.insert(tk.END, "🎉 No one! Everyone you follow follows you back.\n")
-    output_text.insert(tk.END, f"\n{'='*60}\n\n")
-    
-    output_text.insert(tk.END, f"2️⃣ PEOPLE WHO FOLLOW YOU BUT YOU DON'T FOLLOW BACK ({len(not_followed_back)}):\n")
-    output_text.insert(tk.END, f"{'─'*60}\n")
-    if not_followed_back:
-        sorted_list = sorted(not_followed_back)
-        for i, username in enumerate(sorted_list[:50], 1):
-            output_text.insert(tk.END, f"{i:3}. @{username}\n")
-        if len(not_followed_back) > 50:
-            output_text.insert(tk.END, f"\n... and {len(not_followed_back) - 50} more\n")
-    else:
-        output_text.insert(tk.END, "✅ You follow back all your followers!\n")
-    output_text.insert(tk.END, f"\n{'='*60}\n\n")
-    
-    output_text.insert(tk.END, f"3️⃣ MUTUAL FOLLOWERS ({len(mutuals)}):\n")
-    output_text.insert(tk.END, f"{'─'*60}\n")
-    if mutuals:
-        sorted_list = sorted(mutuals)
-        for i, username in enumerate(sorted_list[:50], 1):
-            output_text.insert(tk.END, f"{i:3}. @{username}\n")
-        if len(mutuals) > 50:
-            output_text.insert(tk.END, f"\n... and {len(mutuals) - 50} more\n")
-    else:
-        output_text.insert(tk.END, "No mutual followers found.\n")
-    
-    output_text.insert(tk.END, f"\n{'='*60}\n")
-    output_text.insert(tk.END, f"✅ Analysis completed successfully!\n")
-    output_text.insert(tk.END, f"Generated: {len(following_usernames) - len(mutuals)} unfollow suggestions\n")
-    
-    output_text.configure(state="disabled")
+    events = queue.Queue()
+    threading.Thread(target=parse_export, args=(base_folder, stamp, events), daemon=True).start()
+    set_busy(True)
+    totals = {"followers": [0, 0], "following": [0, 0]}
+    root.after(POLL_INTERVAL_MS, poll_events, events, show_results, totals)
 
-# Tkinter GUI
-root = tk.Tk()
-root.title("📊 Instagram Mutuals Checker (Updated for New Format)")
-root.configure(bg="#f4f6f7")
+def analyze_structure():
+    """Debug function to analyze JSON structure"""
+    start_analysis(show_results=False)
 
-# Center the window
-window_width = 1200
-window_height = 900
-screen_width = root.winfo_screenwidth()
-screen_height = root.winfo_screenheight()
-x_position = int((screen_width / 2) - (window_width / 2))
-y_position = int((screen_height / 2) - (window_height / 2))
-root.geometry(f"{window_width}x{window_height}+{x_position}+{y_position}")
+def process_files():
+    start_analysis(show_results=True)
 
-# 📚 Fonts and style
-style = ttk.Style()
-style.configure("TButton", font=("Helvetica", 12), padding=6)
-style.configure("TLabel", font=("Helvetica", 12), background="#f4f6f7")
-style.configure("Title.TLabel", font=("Helvetica", 20, "bold"), background="#f4f6f7")
-style.configure("TFrame", background="#f4f6f7")
+base_folder = None
+# Last finished parse: {"location", "stamp", "structures", "report"}
+analysis = None
 
-main_frame = ttk.Frame(root, padding=20)
-main_frame.pack(fill="both", expand=True)
+if __name__ == "__main__":
+    # Tkinter GUI
+    root = tk.Tk()
+    root.title("📊 Instagram Mutuals Checker (Updated for New Format)")
+    root.configure(bg="#f4f6f7")
 
-title_label = ttk.Label(main_frame, text="📊 Instagram Mutuals Checker (New Format)", style="Title.TLabel")
-title_label.pack(pady=10)
+    # Center the window
+    window_width = 1200
+    window_height = 900
+    screen_width = root.winfo_screenwidth()
+    screen_height = root.winfo_screenheight()
+    x_position = int((screen_width / 2) - (window_width / 2))
+    y_position = int((screen_height / 2) - (window_height / 2))
+    root.geometry(f"{window_width}x{window_height}+{x_position}+{y_position}")
 
-instructions = ttk.Label(main_frame, 
-    text="Select the folder containing your Instagram data export. Instagram's new format stores:\n• followers_1.json (contains your followers)\n• following.json (contains people you follow)",
-    wraplength=800,
-    justify="center")
-instructions.pack(pady=5)
+    # 📚 Fonts and style
+    style = ttk.Style()
+    style.configure("TButton", font=("Helvetica", 12), padding=6)
+    style.configure("TLabel", font=("Helvetica", 12), background="#f4f6f7")
+    style.configure("Title.TLabel", font=("Helvetica", 20, "bold"), background="#f4f6f7")
+    style.configure("TFrame", background="#f4f6f7")
 
-folder_button = ttk.Button(main_frame, text="📁 Select Instagram Data Folder", command=select_base_folder)
-folder_button.pack(pady=5)
+    main_frame = ttk.Frame(root, padding=20)
+    main_frame.pack(fill="both", expand=True)
 
-folder_label = ttk.Label(main_frame, text="No folder selected.", wraplength=800)
-folder_label.pack(pady=5)
+    title_label = ttk.Label(main_frame, text="📊 Instagram Mutuals Checker (New Format)", style="Title.TLabel")
+    title_label.pack(pady=10)
 
-button_frame = ttk.Frame(main_frame)
-button_frame.pack(pady=10)
+    instructions = ttk.Label(main_frame, 
+        text="Select the folder (or the raw ZIP) containing your Instagram data export. Instagram's new format stores:\n• followers_1.json, followers_2.json, ... (contain your followers)\n• following.json (contains people you follow)",
+        wraplength=800,
+        justify="center")
+    instructions.pack(pady=5)
 
-debug_button = ttk.Button(button_frame, text="🔍 Analyze Structure", command=analyze_structure)
-debug_button.pack(side=tk.LEFT, padx=5)
+    folder_button = ttk.Button(main_frame, text="📁 Select Instagram Data Folder", command=select_base_folder)
+    folder_button.pack(pady=5)
 
-process_button = ttk.Button(button_frame, text="▶️ Process and Show Results", command=process_files)
-process_button.pack(side=tk.LEFT, padx=5)
+    zip_button = ttk.Button(main_frame, text="📦 Or Select Export ZIP", command=select_export_zip)
+    zip_button.pack(pady=5)
 
-output_frame = ttk.Frame(main_frame, padding=10)
-output_frame.pack(fill="both", expand=True)
+    folder_label = ttk.Label(main_frame, text="No folder selected.", wraplength=800)
+    folder_label.pack(pady=5)
 
-output_text = scrolledtext.ScrolledText(output_frame, wrap=tk.WORD, font=("Consolas", 11), state="disabled")
-output_text.pack(fill="both", expand=True)
+    button_frame = ttk.Frame(main_frame)
+    button_frame.pack(pady=10)
 
-base_folder = None
+    debug_button = ttk.Button(button_frame, text="🔍 Analyze Structure", command=analyze_structure)
+    debug_button.pack(side=tk.LEFT, padx=5)
+
+    process_button = ttk.Button(button_frame, text="▶️ Process and Show Results", command=process_files)
+    process_button.pack(side=tk.LEFT, padx=5)
+
+    status_label = ttk.Label(main_frame, text="")
+    status_label.pack(pady=5)
+
+    output_frame = ttk.Frame(main_frame, padding=10)
+    output_frame.pack(fill="both", expand=True)
+
+    output_text = scrolledtext.ScrolledText(output_frame, wrap=tk.WORD, font=("Consolas", 11), state="disabled")
+    output_text.pack(fill="both", expand=True)
 
-root.mainloop()
\ No newline at end of file
+    root.mainloop()
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""gunicorn settings, read by default when ``gunicorn --chdir app app:app`` runs from the repository root.
+
+The hooks manage the shared metrics directory the way prometheus_client's
+multiprocess mode requires: it is emptied when the server starts, and each
+worker that exits has its metrics file folded into dead-workers.json. This
+keeps /metrics summing a bounded number of files however often workers are
+recycled (max_requests) or the server is redeployed.
+"""
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app")
+sys.path.insert(0, APP_DIR)
+
+from metrics import Metrics
+
+# Must match app.config['METRICS_DIR']; importing the app here would start its job threads in the arbiter
+metrics = Metrics(os.path.join(APP_DIR, "instance", "metrics"))
+
+
+def on_starting(server):
+    metrics.clear_directory()
+
+
+def child_exit(server, worker):
+    metrics.mark_process_dead(worker.pid)
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app modules are imported flat, the way app.py and the scripts import them; the scripts live at the root
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "app"))
@@ -0,0 +1,64 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from analysis import AnalysisError, diff_usernames, read_export_archive
+from snapshots import pack_side, unpack_timestamps
+
+FOLLOWERS = [{"string_list_data": [{"value": f"user{i}", "timestamp": 1700000000 + i}]} for i in range(200)]
+FOLLOWING = {"relationships_following": [{"title": f"user{i}", "string_list_data": [{"timestamp": 1}]} for i in range(200)]}
+
+
+def export_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("connections/followers_1.json", json.dumps(FOLLOWERS))
+        archive.writestr("connections/following.json", json.dumps(FOLLOWING))
+    return buffer.getvalue()
+
+
+def corrupt(data, member):
+    """Overwrite the middle of a member's compressed bytes."""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        info = archive.getinfo(member)
+    start = info.header_offset + 30 + len(info.filename) + len(info.extra)
+    middle = start + info.compress_size // 2
+    return data[:middle] + b"\xff" * 16 + data[middle + 16:]
+
+
+def test_reads_both_sides():
+    followers, following = read_export_archive(io.BytesIO(export_zip()), "export.zip")
+    assert len(followers) == 200 and len(following) == 200
+
+
+@pytest.mark.parametrize("member", ["connections/followers_1.json", "connections/following.json"])
+def test_corrupt_member_is_an_analysis_error(member):
+    with pytest.raises(AnalysisError, match="Error reading the export ZIP."):
+        read_export_archive(io.BytesIO(corrupt(export_zip(), member)), "export.zip")
+
+
+def test_encrypted_member_is_an_analysis_error():
+    data = bytearray(export_zip())
+    # Set the "encrypted" flag bit in every local and central directory header
+    for signature, flag_offset in ((b"PK\x03\x04", 6), (b"PK\x01\x02", 8)):
+        position = data.find(signature)
+        while position != -1:
+            data[position + flag_offset] |= 1
+            position = data.find(signature, position + 4)
+    with pytest.raises(AnalysisError, match="Error reading the export ZIP."):
+        read_export_archive(io.BytesIO(bytes(data)), "export.zip")
+
+
+@pytest.mark.parametrize("timestamp", [2 ** 70, -(2 ** 70), float("inf"), float("nan"), 1.5, "1700000000", None])
+def test_unusable_timestamps_become_missing(timestamp):
+    result = diff_usernames({"a": timestamp, "b": 1700000000}, {"a": 1600000000.0, "c": 2 ** 63 - 1})
+    assert list(result["mutuals"].timestamps["followers"]) == [0]
+    assert list(result["mutuals"].timestamps["following"]) == [1600000000]
+    assert list(result["not_following_back"].timestamps["following"]) == [2 ** 63 - 1]
+
+
+def test_snapshot_keeps_only_usable_timestamps():
+    _, blob = pack_side({"a": 2 ** 70, "b": float("-inf"), "c": 1700000000})
+    assert list(unpack_timestamps(blob)) == [0, 0, 1700000000]
@@ -0,0 +1,141 @@
+import io
+import json
+import re
+import time
+
+import pytest
+
+import app as web
+from analysis import AnalysisError
+from jobs import JobQueue
+from result_cache import ResultCache
+from result_store import ResultStore
+from snapshots import SnapshotStore
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """A test client whose stores, cache and metrics live in a temporary directory."""
+    config = web.app.config
+    monkeypatch.setattr(web, "result_cache", ResultCache(
+        config["RESULT_CACHE_SIZE"], config["RESULT_CACHE_TTL"], max_bytes=config["RESULT_CACHE_MAX_BYTES"],
+        sizeof=web.result_size))
+    monkeypatch.setattr(web, "result_store", ResultStore(str(tmp_path / "results.sqlite3")))
+    monkeypatch.setattr(web, "snapshot_store", SnapshotStore(str(tmp_path / "snapshots.sqlite3")))
+    monkeypatch.setattr(web, "job_queue", JobQueue(str(tmp_path / "jobs.sqlite3"), user_errors=(AnalysisError,)))
+    monkeypatch.setattr(web.registry, "directory", str(tmp_path / "metrics"))
+    return web.app.test_client()
+
+
+def export_files(followers, following):
+    followers_json = json.dumps([{"string_list_data": [{"value": name, "timestamp": 1}]} for name in followers])
+    following_json = json.dumps({"relationships_following": [{"title": name} for name in following]})
+    return {"followers_file": (io.BytesIO(followers_json.encode()), "followers_1.json"),
+            "following_file": (io.BytesIO(following_json.encode()), "following.json")}
+
+
+def upload(client, followers, following, url="/", **fields):
+    return client.post(url, data={**export_files(followers, following), **fields}, content_type="multipart/form-data")
+
+
+def test_repeat_upload_is_one_cache_lookup(client):
+    assert upload(client, ["a", "b"], ["a"]).status_code == 200
+    web.result_cache.clear()
+    assert upload(client, ["a", "b"], ["a"]).status_code == 200
+    assert upload(client, ["a", "b"], ["a"]).status_code == 200
+    stats = web.result_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_snapshot_history_belongs_to_the_uploader(client):
+    upload(client, ["a", "b"], ["a"], account="@Me")
+    time.sleep(0.01)
+    page = upload(client, ["a", "c"], ["a"], account="me")
+    assert b"since your last upload" in page.data
+
+    snapshots = client.get("/api/accounts/@Me/snapshots").get_json()
+    assert snapshots["account"] == "me" and len(snapshots["snapshots"]) == 2
+    diff = client.get("/api/accounts/ME/diff").get_json()
+    assert [entry["username"] for entry in diff["new_followers"]] == ["c"]
+    assert [entry["username"] for entry in diff["lost_followers"]] == ["b"]
+
+    stranger = web.app.test_client()
+    assert stranger.get("/api/accounts/me/snapshots").get_json()["snapshots"] == []
+    assert stranger.get("/api/accounts/me/diff").status_code == 404
+    upload(stranger, ["x"], ["x"], account="me")
+    assert len(client.get("/api/accounts/me/snapshots").get_json()["snapshots"]) == 2
+
+
+def test_invalid_account_in_the_path_is_rejected(client):
+    assert client.get("/api/accounts/not a name/snapshots").status_code == 400
+    assert client.get("/api/accounts/not a name/diff").status_code == 400
+
+
+def test_job_runs_the_analysis_and_links_the_result(client):
+    response = upload(client, ["a", "b"], ["a", "c"], url="/jobs")
+    assert response.status_code == 202
+    job_url = response.headers["Location"]
+    job = response.get_json()
+    deadline = time.monotonic() + 5
+    while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.01)
+        job = client.get(job_url).get_json()
+    assert job["status"] == "done" and job["records_seen"] == 4
+    assert client.get(job["result_url"]).status_code == 200
+
+    repeat = upload(client, ["a", "b"], ["a", "c"], url="/jobs").get_json()
+    assert repeat["status"] == "done" and repeat["result_id"] == job["result_id"]
+
+
+def test_job_errors_are_json(client):
+    assert client.post("/jobs", data={}).get_json() == {
+        "error": "Please upload your export ZIP, or both files: followers_1.json and following.json"}
+    response = client.post("/jobs", data={**export_files(["a"], ["a"]), "followers_file": (io.BytesIO(b"[1,"), "f.json")},
+                           content_type="multipart/form-data")
+    job = response.get_json()
+    deadline = time.monotonic() + 5
+    while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.01)
+        job = client.get(response.headers["Location"]).get_json()
+    assert (job["status"], job["error"]) == ("failed", "Error reading one or both JSON files.")
+    assert client.get("/jobs/missing").status_code == 404
+
+
+def result_id(page):
+    return re.search(r"/api/results/(\w+)", page.get_data(as_text=True)).group(1)
+
+
+def test_results_api_pages_and_searches(client):
+    followers = [f"fan{i:03d}" for i in range(250)] + ["a\nb"]
+    result = result_id(upload(client, followers, ["fan000"]))
+    url = f"/api/results/{result}/not_followed_back"
+
+    usernames, cursor = [], 0
+    while cursor is not None:
+        page = client.get(url, query_string={"cursor": cursor, "limit": 100}).get_json()
+        assert page["total"] == 250 and len(page["usernames"]) <= 100
+        usernames += page["usernames"]
+        cursor = page["next_cursor"]
+    assert usernames == sorted(["ab", *followers[1:250]])
+
+    page = client.get(url, query_string={"q": "FAN10", "limit": 5}).get_json()
+    assert page["usernames"] == ["fan100", "fan101", "fan102", "fan103", "fan104"]
+    page = client.get(url, query_string={"q": "fan10", "limit": 5, "cursor": page["next_cursor"]}).get_json()
+    assert page == {"category": "not_followed_back", "total": 250, "usernames": [f"fan10{i}" for i in range(5, 10)],
+                    "next_cursor": None}
+    assert client.get(url, query_string={"q": "49", "mode": "substring"}).get_json()["usernames"] == [
+        "fan049", "fan149", "fan249"]
+
+    assert client.get(url, query_string={"limit": 0}).status_code == 400
+    assert client.get(url, query_string={"mode": "regex"}).status_code == 400
+    assert client.get(f"/api/results/{result}/nobody").status_code == 404
+    assert client.get("/api/results/missing/mutuals").status_code == 404
+
+
+def test_stored_result_keeps_every_row(client):
+    result = result_id(upload(client, ["a\nb", "c"], ["x"]))
+    web.result_cache.clear()
+    page = client.get(f"/api/results/{result}/not_followed_back").get_json()
+    assert page["usernames"] == ["ab", "c"]
+    rows = client.get(f"/api/results/{result}/not_followed_back/download.jsonl").get_data(as_text=True).splitlines()
+    assert [json.loads(row)["followed_you_at"] for row in rows] == [1, 1]
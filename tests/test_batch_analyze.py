@@ -0,0 +1,42 @@
+import io
+import json
+import zipfile
+
+from batch_analyze import analyze_export, find_exports, format_summary, run_batch
+
+
+def write_export(directory, followers, following):
+    directory.mkdir()
+    (directory / "followers_1.json").write_text(
+        json.dumps([{"string_list_data": [{"value": name, "timestamp": 1}]} for name in followers]))
+    (directory / "following.json").write_text(json.dumps({"relationships_following": [{"title": name} for name in following]}))
+
+
+def test_every_export_gets_a_record_and_failures_do_not_stop_the_run(tmp_path):
+    write_export(tmp_path / "good", ["a", "b"], ["a", "c"])
+    (tmp_path / "empty").mkdir()
+    (tmp_path / "broken.zip").write_bytes(b"PK\x03\x04 not really a zip")
+    with zipfile.ZipFile(tmp_path / "bad_json.zip", "w") as archive:
+        archive.writestr("followers_1.json", "[1,")
+        archive.writestr("following.json", "[]")
+    (tmp_path / ".hidden").mkdir()
+
+    exports = find_exports(str(tmp_path))
+    assert [account for account, _ in exports] == ["bad_json", "broken", "empty", "good"]
+    output = io.StringIO()
+    summary = run_batch(exports, output, workers=2, counts_only=True)
+
+    records = {record["account"]: record for record in map(json.loads, output.getvalue().splitlines())}
+    assert records["good"]["counts"] == {"not_following_back": 1, "not_followed_back": 1, "mutuals": 1}
+    assert "not_following_back" not in records["good"]
+    assert records["empty"]["error"] == "Could not find followers_N.json and following.json."
+    assert records["broken"]["error"] and records["bad_json"]["error"]
+    assert (summary["exports"], summary["succeeded"], summary["failed"]) == (4, 1, 3)
+    assert "1/4 exports analysed (3 failed)" in format_summary(summary)
+
+
+def test_full_record_lists_usernames(tmp_path):
+    write_export(tmp_path / "me", ["a", "b"], ["a"])
+    record = analyze_export("me", str(tmp_path / "me"))
+    assert (record["mutuals"], record["not_followed_back"], record["not_following_back"]) == (["a"], ["b"], [])
+    assert record["records"] == 3 and record["bytes"] > 0
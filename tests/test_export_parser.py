@@ -0,0 +1,69 @@
+import io
+import json
+
+import pytest
+
+from export_parser import UsernameStream, collect_usernames
+
+FOLLOWERS = [
+    {"title": "", "media_list_data": [], "string_list_data": [
+        {"href": "https://www.instagram.com/Alice", "value": "Alice", "timestamp": 1700000000}]},
+    {"title": "", "media_list_data": [], "string_list_data": [
+        {"href": "https://www.instagram.com/bob", "value": "bob", "timestamp": 1600000000}]},
+]
+FOLLOWING = {
+    "a": 1.5e3,
+    "b": [-12, 3e-2, 0.25, True, None],
+    "relationships_following": [
+        {"title": "carol", "string_list_data": [{"href": "https://www.instagram.com/_u/carol", "timestamp": 1500000000}]},
+        {"title": "dave", "string_list_data": [{"href": "https://www.instagram.com/_u/dave"}]},
+    ],
+}
+CHUNK_SIZES = [1, 2, 3, 5, 7, 9, 64 * 1024]
+
+
+def parse(data, chunk_size):
+    stream = UsernameStream(io.BytesIO(data), chunk_size=chunk_size)
+    return collect_usernames(stream), stream
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_list_export_at_every_chunk_boundary(chunk_size):
+    usernames, stream = parse(json.dumps(FOLLOWERS, indent=2).encode(), chunk_size)
+    assert usernames == {"alice": 1700000000, "bob": 1600000000}
+    assert stream.root_key is None
+    assert stream.records == 2
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_dict_export_with_numbers_split_across_chunks(chunk_size):
+    data = json.dumps(FOLLOWING, separators=(",", ":")).encode()
+    usernames, stream = parse(data, chunk_size)
+    assert usernames == {"carol": 1500000000, "dave": None}
+    assert stream.root_key == "relationships_following"
+    assert stream.sample == FOLLOWING["relationships_following"][0]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 64 * 1024])
+def test_utf8_bom_and_multibyte_names(chunk_size):
+    data = "\ufeff" + json.dumps([{"string_list_data": [{"value": "Zoë", "timestamp": 1}]}], ensure_ascii=False)
+    usernames, _ = parse(data.encode("utf-8"), chunk_size)
+    assert usernames == {"zoë": 1}
+
+
+def test_text_mode_input():
+    stream = UsernameStream(io.StringIO(json.dumps(FOLLOWERS)), chunk_size=3)
+    assert collect_usernames(stream) == {"alice": 1700000000, "bob": 1600000000}
+
+
+@pytest.mark.parametrize("data", [b"", b"42", b"[1.", b'{"relationships_following": [{"title": "x"}'])
+def test_malformed_exports_raise_value_error(data):
+    with pytest.raises(ValueError):
+        parse(data, 2)
+
+
+def test_control_characters_and_empty_names_are_dropped():
+    data = json.dumps([{"string_list_data": [{"value": name, "timestamp": 1}]}
+                       for name in ["a\nb", "C\u0085", "\t", "  "]])
+    usernames, _ = parse(data.encode(), 5)
+    assert usernames == {"ab": 1, "c": 1}
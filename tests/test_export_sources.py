@@ -0,0 +1,73 @@
+import io
+import json
+import os
+import signal
+import zipfile
+
+import pytest
+
+import export_sources
+from export_sources import ExportSource, read_followers
+
+
+def write_part(path, names):
+    with open(path, "w") as file:
+        json.dump([{"string_list_data": [{"value": name, "timestamp": 1}]} for name in names], file)
+
+
+@pytest.fixture
+def export_folder(tmp_path):
+    connections = tmp_path / "connections" / "followers_and_following"
+    connections.mkdir(parents=True)
+    (tmp_path / "media").mkdir()
+    write_part(connections / "followers_1.json", ["a", "b"])
+    write_part(connections / "followers_2.json", ["c"])
+    write_part(connections / "following.json", ["a"])
+    write_part(tmp_path / "media" / "followers_3.json", ["ignored"])
+    return tmp_path
+
+
+def test_folder_parts_are_found_in_order_and_merged(export_folder):
+    with ExportSource(str(export_folder)) as source:
+        assert [source.display_name(member) for member in source.followers] == ["followers_1.json", "followers_2.json"]
+        assert read_followers(source) == {"a": 1, "b": 1, "c": 1}
+
+
+def test_broken_pool_is_replaced_and_the_read_still_finishes(export_folder):
+    with ExportSource(str(export_folder)) as source:
+        read_followers(source)
+        pool = export_sources._get_pool()
+        for process in list(pool._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+            process.join()
+        assert read_followers(source) == {"a": 1, "b": 1, "c": 1}
+        assert export_sources._get_pool() is not pool
+        assert read_followers(source) == {"a": 1, "b": 1, "c": 1}
+
+
+def test_encrypted_member_is_a_value_error():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("followers_1.json", "[]")
+    data = bytearray(buffer.getvalue())
+    for signature, flag_offset in ((b"PK\x03\x04", 6), (b"PK\x01\x02", 8)):
+        data[data.find(signature) + flag_offset] |= 1
+    with ExportSource(io.BytesIO(bytes(data))) as source, pytest.raises(ValueError):
+        source.open(source.followers[0])
+
+
+def test_zip_parts_are_read_through_the_pool(export_folder, tmp_path_factory):
+    path = tmp_path_factory.mktemp("zip") / "export.zip"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for file in (export_folder / "connections").rglob("*.json"):
+            archive.write(file, file.relative_to(export_folder))
+    with ExportSource(str(path)) as source:
+        assert len(source.followers) == 2
+        assert read_followers(source) == {"a": 1, "b": 1, "c": 1}
+
+
+def test_pool_workers_open_folder_parts_without_scanning(export_folder, monkeypatch):
+    monkeypatch.setattr(export_sources, "scan_folder", None)
+    member = os.path.join("connections", "followers_and_following", "followers_2.json")
+    usernames, bytes_read, records = export_sources._read_part(str(export_folder), False, member)
+    assert usernames == {"c": 1} and records == 1 and bytes_read > 0
@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from jobs import DONE, FAILED, JobQueue, QueueFull
+
+
+class UserError(Exception):
+    pass
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), max_workers=1, max_pending=2, ttl=60, user_errors=(UserError,))
+
+
+def wait(queue, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in (DONE, FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_reports_progress_and_result(queue):
+    def work(progress):
+        progress(100, 3)
+        progress(50, 2)
+        return "result-1"
+    job = wait(queue, queue.submit(work))
+    assert (job["status"], job["result_id"], job["bytes_parsed"], job["records_seen"]) == (DONE, "result-1", 150, 5)
+
+
+def test_user_errors_are_shown_and_other_failures_are_logged(queue, caplog):
+    def bad_upload(progress):
+        raise UserError("Error reading the export ZIP.")
+
+    def bug(progress):
+        raise KeyError("oops")
+
+    assert wait(queue, queue.submit(bad_upload))["error"] == "Error reading the export ZIP."
+    with caplog.at_level(logging.ERROR, logger="jobs"):
+        job = wait(queue, queue.submit(bug))
+    assert (job["status"], job["error"]) == (FAILED, "Analysis failed.")
+    assert "KeyError: 'oops'" in caplog.text
+
+
+def test_queue_is_bounded_and_runs_cleanup(queue):
+    release = threading.Event()
+    cleaned = []
+    blocked = [queue.submit(lambda progress: release.wait() and "r", cleanup=lambda: cleaned.append(1))
+               for _ in range(2)]
+    with pytest.raises(QueueFull):
+        queue.submit(lambda progress: "r")
+    release.set()
+    for job_id in blocked:
+        wait(queue, job_id)
+    # cleanup runs after the job's slot is given back
+    deadline = time.monotonic() + 5
+    while len(cleaned) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cleaned == [1, 1]
+    wait(queue, queue.submit(lambda progress: "r"))
+
+
+def test_completed_and_expired_jobs(queue, monkeypatch):
+    job_id = queue.completed("cached")
+    assert queue.get(job_id)["status"] == DONE
+    assert queue.get("missing") is None
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    queue.cleanup_expired()
+    assert queue.get(job_id) is None
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+from metrics import DEAD_WORKERS_FILE, Metrics
+
+
+def sample(text, name):
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    """A registry that writes as a made-up pid, like another gunicorn worker."""
+    def make(pid):
+        monkeypatch.setattr(os, "getpid", lambda: pid)
+        return Metrics(str(tmp_path), buckets=(0.1, 1, float("inf")))
+    return make
+
+
+def test_render_sums_every_worker(worker):
+    first = worker(101)
+    first.inc("fan_requests_total", endpoint="index", status=200)
+    first.observe("fan_request_duration_seconds", 0.05, endpoint="index")
+    first.flush()
+    second = worker(102)
+    second.inc("fan_requests_total", 2, endpoint="index", status=200)
+    second.observe("fan_request_duration_seconds", 5, endpoint="index")
+    text = second.render()
+
+    assert "# TYPE fan_requests_total counter" in text
+    assert sample(text, "fan_requests_total") == ['fan_requests_total{endpoint="index",status="200"} 3']
+    assert sample(text, "fan_request_duration_seconds") == [
+        'fan_request_duration_seconds_bucket{endpoint="index",le="0.1"} 1',
+        'fan_request_duration_seconds_bucket{endpoint="index",le="1.0"} 1',
+        'fan_request_duration_seconds_bucket{endpoint="index",le="+Inf"} 2',
+        'fan_request_duration_seconds_sum{endpoint="index"} 5.05',
+        'fan_request_duration_seconds_count{endpoint="index"} 2',
+    ]
+
+
+def test_flush_is_throttled_unless_forced(worker, tmp_path):
+    registry = worker(101)
+
+    def flushed():
+        (path,) = tmp_path.glob("worker-101-*.json")
+        return json.loads(path.read_text())["counters"]
+
+    registry.inc("fan_downloads_total", format="csv")
+    registry.flush()
+    registry.inc("fan_downloads_total", format="csv")
+    registry.flush()
+    assert flushed() == [["fan_downloads_total", [["format", "csv"]], 1]]
+    registry.flush(force=True)
+    assert flushed() == [["fan_downloads_total", [["format", "csv"]], 2]]
+
+
+def test_dead_workers_are_folded_into_one_file(worker, tmp_path):
+    for pid in (101, 102, 103):
+        registry = worker(pid)
+        registry.inc("fan_downloads_total", pid, format="csv")
+        registry.flush()
+    reader = worker(200)
+    reader.mark_process_dead(101)
+    reader.mark_process_dead(102)
+    reader.mark_process_dead(999)
+
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == [
+        DEAD_WORKERS_FILE, os.path.basename(next(tmp_path.glob("worker-103-*.json")))]
+    assert sample(reader.render(), "fan_downloads_total") == ['fan_downloads_total{format="csv"} 306']
+
+    reader.clear_directory()
+    assert list(tmp_path.glob("*.json")) == []
+
+
+def test_collectors_are_published(worker):
+    registry = worker(101)
+    registry.register(lambda: [("fan_result_cache_hits_total", 4, {})])
+    assert sample(registry.render(), "fan_result_cache_hits_total") == ["fan_result_cache_hits_total 4"]
@@ -0,0 +1,38 @@
+from result_cache import ResultCache
+
+
+def test_evicts_least_recently_used_to_stay_within_max_bytes():
+    cache = ResultCache(max_entries=10, max_bytes=100, sizeof=len)
+    cache.put("a", "x" * 40)
+    cache.put("b", "x" * 40)
+    assert cache.get("a") is not None
+    cache.put("c", "x" * 40)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["bytes"] == 80
+    assert cache.stats()["evictions"] == 1
+
+
+def test_value_larger_than_budget_is_not_cached():
+    cache = ResultCache(max_bytes=10, sizeof=len)
+    cache.put("big", "x" * 11)
+    assert cache.get("big") is None
+    assert len(cache) == 0
+
+
+def test_replacing_a_key_keeps_byte_count_exact():
+    cache = ResultCache(max_bytes=100, sizeof=len)
+    cache.put("a", "x" * 30)
+    cache.put("a", "x" * 50)
+    assert cache.stats()["bytes"] == 50
+    cache.clear()
+    assert cache.stats()["bytes"] == 0
+
+
+def test_expired_entries_are_dropped():
+    now = [0]
+    cache = ResultCache(ttl=5, clock=lambda: now[0], sizeof=len)
+    cache.put("a", "xyz")
+    now[0] = 6
+    assert cache.get("a") is None
+    assert cache.stats() == {"entries": 0, "bytes": 0, "hits": 0, "misses": 1, "evictions": 0}
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from snapshots import MERGE_BLOCK, SnapshotStore, merge_diff
+
+
+def names(count, prefix="u"):
+    return [f"{prefix}{i:05d}" for i in range(count)]
+
+
+@pytest.mark.parametrize("old, new", [
+    ([], []),
+    ([], ["a"]),
+    (["a"], []),
+    (names(MERGE_BLOCK * 3), names(MERGE_BLOCK * 3)),
+    (names(MERGE_BLOCK * 3), names(MERGE_BLOCK * 3)[1:] + ["v"]),
+    (["a", "c", "e"], ["b", "c", "d"]),
+])
+def test_merge_diff_returns_added_and_removed_positions(old, new):
+    added, removed = merge_diff(old, new)
+    assert [new[i] for i in added] == sorted(set(new) - set(old))
+    assert [old[i] for i in removed] == sorted(set(old) - set(new))
+
+
+def test_merge_diff_on_random_snapshots():
+    generator = random.Random(7)
+    universe = names(1000)
+    for _ in range(30):
+        old = sorted(generator.sample(universe, generator.randrange(0, 600)))
+        new = sorted(set(old) - set(generator.sample(old, len(old) // 10))
+                     | set(generator.sample(universe, generator.randrange(0, 50))))
+        added, removed = merge_diff(old, new)
+        assert [new[i] for i in added] == sorted(set(new) - set(old))
+        assert [old[i] for i in removed] == sorted(set(old) - set(new))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(str(tmp_path / "snapshots.sqlite3"))
+
+
+def test_history_previous_and_diff(store):
+    first = store.save("me", "d1", {"a": 10, "b": 20}, {"x": 1})
+    second = store.save("me", "d2", {"a": 10, "c": 30}, {"x": 1, "y": None})
+    other = store.save("someone", "d1", {"z": 1}, {})
+
+    assert store.save("me", "d1", {"ignored": 1}, {}) == first
+    assert [row["snapshot_id"] for row in store.history("me")] == [second, first]
+    assert store.previous("me", second) == first
+    assert store.previous("me", first) is None
+    assert store.previous("someone", other) is None
+
+    assert store.diff("me", first, second) == {
+        "new_followers": [{"username": "c", "timestamp": 30}],
+        "lost_followers": [{"username": "b", "timestamp": 20}],
+        "new_following": [{"username": "y", "timestamp": None}],
+        "removed_following": [],
+    }
+
+
+def test_diff_of_another_accounts_snapshot_is_unknown(store):
+    mine = store.save("me", "d1", {"a": 1}, {})
+    theirs = store.save("someone", "d2", {"b": 1}, {})
+    with pytest.raises(KeyError):
+        store.diff("me", mine, theirs)
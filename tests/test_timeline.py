@@ -0,0 +1,26 @@
+from analysis import diff_usernames
+from timeline import EARLIEST, timeline
+
+NOW = 1_700_000_000
+
+
+def test_implausible_timestamps_are_left_out_of_the_bins():
+    followers = {"a": NOW - 86400, "b": 99999999999, "c": 10 ** 12, "d": -5, "e": 1}
+    following = {"a": NOW - 3 * 86400, "x": 2 ** 62, "y": EARLIEST - 1, "z": NOW - 400 * 86400}
+    data = timeline(diff_usernames(followers, following), "day", now=NOW)
+
+    assert len(data["labels"]) == 400
+    assert data["totals"] == {"followers": 1, "following": 2, "mutuals_formed": 1}
+    assert sum(data["series"]["followers"]) == 1 and sum(data["series"]["following"]) == 2
+
+    celebrities = data["celebrities"]
+    assert [entry["username"] for entry in celebrities["oldest"]] == ["z"]
+    assert sum(bucket["count"] for bucket in celebrities["buckets"]) == 1
+    assert celebrities["unknown"] == 2
+
+
+def test_only_implausible_timestamps_give_an_empty_timeline():
+    data = timeline(diff_usernames({"a": 10 ** 12}, {"a": 10 ** 12}), "week", now=NOW)
+    assert data["labels"] == []
+    assert data["series"] == {"followers": [], "following": [], "mutuals_formed": []}
+    assert data["celebrities"]["oldest"] == []
@@ -0,0 +1,104 @@
+import random
+from array import array
+
+import pytest
+
+from username_index import UsernameIndex, UsernameRows, partition_sorted
+
+NAMES = ["alice", "bob", "carol", "dave", "erin"]
+
+
+def names(count, step=1, prefix="u"):
+    return [f"{prefix}{i:06d}" for i in range(0, count, step)]
+
+
+@pytest.mark.parametrize("left, right", [
+    ([], []),
+    (["a"], []),
+    ([], ["a"]),
+    (["a", "b", "c"], ["a", "b", "c"]),
+    (["a", "c", "e"], ["b", "d", "f"]),
+    (names(10), names(1000)),
+    (names(1000), names(10)),
+    (names(1000, 3), names(1000, 7)),
+    (names(50) + names(50, prefix="w"), names(10, prefix="v")),
+])
+def test_partition_sorted_matches_set_difference(left, right):
+    left_only, right_only, both = partition_sorted(left, right)
+    assert left_only == sorted(set(left) - set(right))
+    assert right_only == sorted(set(right) - set(left))
+    assert both == sorted(set(left) & set(right))
+
+
+def test_partition_sorted_on_random_inputs():
+    generator = random.Random(13)
+    universe = names(2000)
+    for _ in range(50):
+        left = sorted(generator.sample(universe, generator.randrange(0, 300)))
+        right = sorted(generator.sample(universe, generator.randrange(0, 1500)))
+        assert partition_sorted(left, right) == (
+            sorted(set(left) - set(right)), sorted(set(right) - set(left)), sorted(set(left) & set(right)))
+
+
+def test_rows_index_and_slice_like_a_list():
+    rows = UsernameIndex(NAMES).names
+    assert isinstance(rows, UsernameRows)
+    assert len(rows) == 5
+    assert rows[0] == "alice" and rows[-1] == "erin"
+    for item in (slice(None), slice(1, 3), slice(-2, None), slice(3, 1), slice(None, None, 2), slice(10, 20)):
+        assert rows[item] == NAMES[item]
+    with pytest.raises(IndexError):
+        rows[5]
+
+
+def test_empty_index():
+    index = UsernameIndex([])
+    assert len(index) == 0 and list(index) == [] and index.names[:] == []
+    assert UsernameIndex.from_blob("").blob == ""
+    assert index.page() == ([], None)
+
+
+def test_blob_round_trip_keeps_rows_and_timestamps():
+    timestamps = {"followers": array("q", [1, 0, 3, 4, 5])}
+    index = UsernameIndex.from_blob(UsernameIndex(NAMES).blob, timestamps)
+    assert list(index) == NAMES
+    assert list(index.iter_rows(2)) == [
+        [("alice", 1, None), ("bob", None, None)],
+        [("carol", 3, None), ("dave", 4, None)],
+        [("erin", 5, None)],
+    ]
+
+
+def collect(index, query, mode, limit):
+    """Every match of a search, fetched ``limit`` at a time by following the cursors."""
+    matches, cursor = [], 0
+    while cursor is not None:
+        page, cursor = index.search(query, mode, cursor, limit)
+        assert len(page) <= limit
+        matches += page
+    return matches
+
+
+def test_page_follows_cursors_to_the_end():
+    index = UsernameIndex(names(25))
+    assert index.page(0, 10) == (names(10), 10)
+    assert index.page(20, 10) == (names(25)[20:], None)
+    assert index.page(25, 10) == ([], None)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 100])
+def test_search_cursors_continue_the_same_search(limit):
+    rows = sorted(["ann", "anna", "annie", "bob", "joanna", "nan", "zanna", "zz"])
+    index = UsernameIndex(rows)
+    assert collect(index, "ann", "prefix", limit) == ["ann", "anna", "annie"]
+    assert collect(index, "ann", "substring", limit) == ["ann", "anna", "annie", "joanna", "zanna"]
+    assert collect(index, "an", "substring", limit) == ["ann", "anna", "annie", "joanna", "nan", "zanna"]
+    assert collect(index, "q", "prefix", limit) == [] and collect(index, "q", "substring", limit) == []
+
+
+def test_substring_search_reports_a_name_once_and_never_spans_rows():
+    index = UsernameIndex(["aaaa", "ab", "ba"])
+    assert index.search("aa", "substring") == (["aaaa"], None)
+    assert index.search("ab", "substring") == (["ab"], None)
+    with pytest.raises(ValueError):
+        index.search("a", "regex")